@@ -1,10 +1,17 @@
 import os
-from typing import List, Optional, Any, Dict
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+import re
+import hmac
+import json
+import uuid
+import shutil
+import asyncio
+from typing import List, Optional, Any, Dict, Tuple
+from fastapi import BackgroundTasks, FastAPI, UploadFile, File, Form, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from pathlib import Path
 
 from src.document_ingestion.data_ingestion import (
@@ -13,10 +20,18 @@ from src.document_ingestion.data_ingestion import (
     ChatIngestor,
     FaissManager,
 )
+from src.document_ingestion.index_jobs import IndexJobManager, TERMINAL_STATES, get_index_job_manager
 from src.document_analyzer.data_analysis import DocumentAnalyzer
 from src.document_compare.document_comparator import DocumentComparatorLLM
 from src.document_chat.retrieval import ConversationalRAG
 from utils.document_ops import FastAPIFileAdapter, read_pdf_via_handler
+from utils.file_io import UploadTooLargeError, save_uploads
+from utils.concurrency import run_blocking
+from utils.vectorstore_cache import get_vectorstore_cache
+from utils.answer_cache import get_answer_cache
+from utils.chat_memory import get_chat_memory
+from utils.result_cache import RESULT_CACHES, get_result_cache
+from utils.model_loader import get_model_registry
 
 FAISS_BASE = os.getenv("FAISS_BASE", "faiss_index")
 UPLOAD_BASE = os.getenv("UPLOAD_BASE", "data")
@@ -43,40 +58,61 @@ async def serve_ui(request: Request):
     return resp
 
 @app.get("/health")
-def health() -> Dict[str, str]:
+async def health() -> Dict[str, str]:
     return {"status": "ok", "service": "document-portal"}
 
 # ---------- ANALYZE ----------
 @app.post("/analyze")
 async def analyze_document(file: UploadFile = File(...)) -> Any:
     try:
-        dh = DocHandler()
-        saved_path = dh.save_pdf(FastAPIFileAdapter(file))
-        text = read_pdf_via_handler(dh, saved_path)
+        dh = await run_blocking(DocHandler)
+        saved_path = await run_blocking(dh.save_pdf, FastAPIFileAdapter(file))
         analyzer = DocumentAnalyzer()
-        result = analyzer.analyze_document(text)
-        return JSONResponse(content=result)
+        sha256 = dh.uploads[saved_path].sha256
+        cache = get_result_cache("analyze")
+        key = analyzer.result_key(sha256)
+        result = await run_blocking(cache.get, key, sha256)
+        if result is not None:
+            return JSONResponse(content=result, headers={"X-Cache": "hit"})
+
+        text = await run_blocking(read_pdf_via_handler, dh, saved_path)
+        result = await analyzer.aanalyze_document(text)
+        await run_blocking(cache.put, key, result, sha256)
+        return JSONResponse(content=result, headers={"X-Cache": "miss"})
     except HTTPException:
         raise
     except Exception as e:
+        if _is_upload_too_large(e):
+            raise HTTPException(status_code=413, detail=f"Analysis failed: upload too large")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
 
 # ---------- COMPARE ----------
 @app.post("/compare")
 async def compare_documents(reference: UploadFile = File(...), actual: UploadFile = File(...)) -> Any:
     try:
-        dc = DocumentComparator()
-        ref_path, act_path = dc.save_uploaded_files(
-            FastAPIFileAdapter(reference), FastAPIFileAdapter(actual)
+        dc = await run_blocking(DocumentComparator)
+        ref_path, act_path = await run_blocking(
+            dc.save_uploaded_files, FastAPIFileAdapter(reference), FastAPIFileAdapter(actual)
         )
-        _ = ref_path, act_path
-        combined_text = dc.combine_documents()
         comp = DocumentComparatorLLM()
-        df = comp.compare_documents(combined_text)
-        return {"rows": df.to_dict(orient="records"), "session_id": dc.session_id}
+        cache = get_result_cache("compare")
+        ref_sha256 = dc.uploads[str(ref_path)].sha256
+        key = comp.result_key(ref_sha256, dc.uploads[str(act_path)].sha256)
+        rows = await run_blocking(cache.get, key, ref_sha256)
+        if rows is not None:
+            return {"rows": rows, "session_id": dc.session_id, "cached": True}
+
+        ref_pages = await run_blocking(dc.read_pages, ref_path)
+        act_pages = await run_blocking(dc.read_pages, act_path)
+        df = await comp.acompare_pages(ref_pages, act_pages)
+        rows = await run_blocking(df.to_dict, orient="records")
+        await run_blocking(cache.put, key, rows, ref_sha256)
+        return {"rows": rows, "session_id": dc.session_id, "cached": False}
     except HTTPException:
         raise
     except Exception as e:
+        if _is_upload_too_large(e):
+            raise HTTPException(status_code=413, detail=f"Comparison failed: upload too large")
         raise HTTPException(status_code=500, detail=f"Comparison failed: {e}")
 
 # ---------- CHAT: INDEX ----------
@@ -91,7 +127,8 @@ async def chat_build_index(
 ) -> Any:
     try:
         wrapped = [FastAPIFileAdapter(f) for f in files]
-        ci = ChatIngestor(
+        ci = await run_blocking(
+            ChatIngestor,
             temp_base=UPLOAD_BASE,
             faiss_base=FAISS_BASE,
             use_session_dirs=use_session_dirs,
@@ -99,63 +136,272 @@ async def chat_build_index(
         )
         # NOTE: ensure your ChatIngestor saves with index_name="index" or FAISS_INDEX_NAME
         # e.g., if it calls FAISS.save_local(dir, index_name=FAISS_INDEX_NAME)
-        ci.built_retriver(  # if your method name is actually build_retriever, fix it there as well
+        await ci.abuilt_retriver(  # if your method name is actually build_retriever, fix it there as well
             wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap, k=k
         )
-        return {"session_id": ci.session_id, "k": k, "use_session_dirs": use_session_dirs}
+        return {
+            "session_id": ci.session_id,
+            "k": k,
+            "use_session_dirs": use_session_dirs,
+            "timings_ms": ci.last_timings,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        if _is_upload_too_large(e):
+            raise HTTPException(status_code=413, detail=f"Indexing failed: upload too large")
+        raise HTTPException(status_code=500, detail=f"Indexing failed: {e}")
+
+# ---------- CHAT: INDEX JOBS ----------
+@app.post("/chat/index/jobs", status_code=202)
+async def chat_index_submit(
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    use_session_dirs: bool = Form(True),
+    chunk_size: int = Form(1000),
+    chunk_overlap: int = Form(200),
+) -> Any:
+    staging = Path(UPLOAD_BASE) / "_staging" / uuid.uuid4().hex
+    try:
+        staged = await run_blocking(save_uploads, [FastAPIFileAdapter(f) for f in files], staging)
+        if not staged:
+            raise HTTPException(status_code=400, detail="No supported files uploaded")
+
+        manager = get_index_job_manager()
+        key = IndexJobManager.dedupe_key(session_id or None, use_session_dirs, staged, chunk_size, chunk_overlap)
+        job = await run_blocking(manager.find, key)
+        merged = job is not None
+        if job is None:
+            ci = await run_blocking(
+                ChatIngestor,
+                temp_base=UPLOAD_BASE,
+                faiss_base=FAISS_BASE,
+                use_session_dirs=use_session_dirs,
+                session_id=session_id or None,
+            )
+            job, merged = await run_blocking(
+                manager.submit, key, ci, staged, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            )
+        if merged:
+            await run_blocking(shutil.rmtree, staging, True)
+        return {"job_id": job.job_id, "session_id": job.session_id, "status": job.status, "deduplicated": merged}
     except HTTPException:
+        await run_blocking(shutil.rmtree, staging, True)
         raise
     except Exception as e:
+        await run_blocking(shutil.rmtree, staging, True)
+        if _is_upload_too_large(e):
+            raise HTTPException(status_code=413, detail=f"Indexing failed: upload too large")
         raise HTTPException(status_code=500, detail=f"Indexing failed: {e}")
 
+@app.get("/chat/index/jobs/{job_id}")
+async def chat_index_status(job_id: str) -> Any:
+    job = await run_blocking(get_index_job_manager().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Index job not found: {job_id}")
+    return job.to_dict()
+
+@app.get("/chat/index/jobs/{job_id}/events")
+async def chat_index_events(job_id: str) -> Any:
+    job = await run_blocking(get_index_job_manager().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Index job not found: {job_id}")
+
+    async def events():
+        # re-read each tick: the job may be running in another worker process
+        current, seen = job, -1
+        while current is not None:
+            if current.version != seen:
+                seen = current.version
+                yield _sse("status", current.to_dict())
+            if current.status in TERMINAL_STATES:
+                break
+            await asyncio.sleep(0.25)
+            current = await run_blocking(get_index_job_manager().get, job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
 # ---------- CHAT: QUERY ----------
 @app.post("/chat/query")
 async def chat_query(
+    background_tasks: BackgroundTasks,
     question: str = Form(...),
     session_id: Optional[str] = Form(None),
+    session_ids: Optional[List[str]] = Form(None),
     use_session_dirs: bool = Form(True),
     k: int = Form(5),
+    conversation_id: Optional[str] = Form(None),
+    use_memory: bool = Form(True),
 ) -> Any:
     try:
-        if use_session_dirs and not session_id:
-            raise HTTPException(status_code=400, detail="session_id is required when use_session_dirs=True")
-
-        index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs else FAISS_BASE  # type: ignore
-        if not os.path.isdir(index_dir):
-            raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
+        rag, shards = await _load_rag(session_id, session_ids, use_session_dirs, k)
+        memory = _chat_memory(conversation_id, use_memory)
+        history = await run_blocking(memory.history, conversation_id) if memory else []
+        response = await rag.ainvoke(question, chat_history=history)
+        if memory:
+            await run_blocking(memory.append, conversation_id, question, response)
+            background_tasks.add_task(memory.asummarize, conversation_id, rag.llm)
 
-        rag = ConversationalRAG(session_id=session_id)
-        rag.load_retriever_from_faiss(index_dir, k=k, index_name=FAISS_INDEX_NAME)  # build retriever + chain
-        response = rag.invoke(question, chat_history=[])
-
-        return {
+        result = {
             "answer": response,
-            "session_id": session_id,
+            "session_id": rag.session_id,
             "k": k,
             "engine": "LCEL-RAG"
         }
+        if memory:
+            result["conversation_id"] = conversation_id
+        if shards:
+            result.update(session_ids=shards, **rag.shard_timings())
+        return result
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
+# ---------- CHAT: QUERY (SSE STREAM) ----------
+@app.post("/chat/query/stream")
+async def chat_query_stream(
+    question: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    session_ids: Optional[List[str]] = Form(None),
+    use_session_dirs: bool = Form(True),
+    k: int = Form(5),
+    conversation_id: Optional[str] = Form(None),
+    use_memory: bool = Form(True),
+) -> Any:
+    try:
+        rag, shards = await _load_rag(session_id, session_ids, use_session_dirs, k)
+        memory = _chat_memory(conversation_id, use_memory)
+        history = await run_blocking(memory.history, conversation_id) if memory else []
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {e}")
+
+    async def events():
+        tokens: List[str] = []
+        try:
+            async for ev in rag.astream(question, chat_history=history):
+                if ev["event"] == "token":
+                    tokens.append(ev["data"])
+                yield _sse(ev["event"], ev["data"])
+            if memory:
+                await run_blocking(memory.append, conversation_id, question, "".join(tokens))
+        except Exception as e:
+            yield _sse("error", {"detail": f"Query failed: {e}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(memory.asummarize, conversation_id, rag.llm) if memory else None,
+    )
+
+# ---------- CHAT: MEMORY ----------
+@app.delete("/chat/memory/{conversation_id}")
+async def chat_memory_clear(conversation_id: str) -> Dict[str, Any]:
+    memory = get_chat_memory()
+    if memory is None:
+        raise HTTPException(status_code=404, detail="Chat memory is disabled")
+    turns = await run_blocking(memory.clear, conversation_id)
+    return {"conversation_id": conversation_id, "turns_deleted": turns}
+
+# ---------- CHAT: CACHE STATS ----------
+@app.get("/chat/cache/stats")
+def chat_cache_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"vectorstores": get_vectorstore_cache().stats()}
+    answers = get_answer_cache()
+    if answers is not None:
+        stats["answers"] = answers.stats()
+    embeddings = get_model_registry().get_embeddings()
+    if hasattr(embeddings, "stats"):
+        stats["embeddings"] = embeddings.stats()
+    return stats
+
+
+# ---------- RESULT CACHES ----------
+@app.get("/cache/results/stats")
+def result_cache_stats() -> Dict[str, Any]:
+    return {name: get_result_cache(name).stats() for name in RESULT_CACHES}
+
+@app.delete("/admin/cache/{name}")
+async def result_cache_invalidate(
+    name: str,
+    sha256: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+) -> Dict[str, Any]:
+    """Drop cached results for one file (sha256; for /compare, the reference file) or all of them."""
+    _require_admin(x_admin_token)
+    if name not in RESULT_CACHES:
+        raise HTTPException(status_code=404, detail=f"Unknown result cache: {name}")
+    if sha256 is not None and not re.fullmatch(r"[0-9a-f]{64}", sha256):
+        raise HTTPException(status_code=400, detail="sha256 must be 64 lowercase hex characters")
+    removed = await run_blocking(get_result_cache(name).invalidate, sha256)
+    return {"cache": name, "sha256": sha256, "removed": removed}
+
 
 # ---------- Helpers ----------
-class FastAPIFileAdapter:
-    """Adapt FastAPI UploadFile -> .name + .getbuffer() API"""
-    def __init__(self, uf: UploadFile):
-        self._uf = uf
-        self.name = uf.filename
-    def getbuffer(self) -> bytes:
-        self._uf.file.seek(0)
-        return self._uf.file.read()
-
-def _read_pdf_via_handler(handler: DocHandler, path: str) -> str:
-    if hasattr(handler, "read_pdf"):
-        return handler.read_pdf(path)  # type: ignore
-    if hasattr(handler, "read_"):
-        return handler.read_(path)  # type: ignore
-    raise RuntimeError("DocHandler has neither read_pdf nor read_ method.")
+def _require_admin(token: Optional[str]):
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+async def _load_rag(
+    session_id: Optional[str], session_ids: Optional[List[str]], use_session_dirs: bool, k: int,
+) -> Tuple[ConversationalRAG, List[str]]:
+    """
+    Build a ConversationalRAG over one index, or over several session indexes when
+    `session_ids` (repeated form field or comma-separated) names more than one.
+    Returns the RAG and the session ids searched in parallel (empty for one index).
+    """
+    shards = list(dict.fromkeys(s.strip() for v in (session_ids or []) for s in v.split(",") if s.strip()))
+    if session_id and shards and session_id not in shards:
+        shards.insert(0, session_id)
+    if len(shards) == 1:
+        session_id, shards = shards[0], []
+
+    if shards:
+        index_dirs = {sid: os.path.join(FAISS_BASE, sid) for sid in shards}
+        missing = [d for d in index_dirs.values() if not os.path.isdir(d)]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"FAISS index not found at: {', '.join(missing)}")
+        rag = ConversationalRAG(session_id=session_id or shards[0])
+        await run_blocking(rag.load_retriever_from_faiss_multi, index_dirs, k=k, index_name=FAISS_INDEX_NAME)
+        return rag, shards
+
+    if use_session_dirs and not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required when use_session_dirs=True")
+
+    index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs else FAISS_BASE  # type: ignore
+    if not os.path.isdir(index_dir):
+        raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
+
+    rag = ConversationalRAG(session_id=session_id)
+    await run_blocking(rag.load_retriever_from_faiss, index_dir, k=k, index_name=FAISS_INDEX_NAME)  # build retriever + chain
+    return rag, []
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _chat_memory(conversation_id: Optional[str], use_memory: bool) -> Optional[Any]:
+    """
+    Chat memory for the caller's conversation; None without a conversation_id, so
+    clients querying the same index never share (or are answered from) one history.
+    """
+    return get_chat_memory() if use_memory and conversation_id else None
+
+def _is_upload_too_large(e: BaseException) -> bool:
+    while e is not None:
+        if isinstance(e, UploadTooLargeError):
+            return True
+        e = e.__cause__
+    return False
 
 
 
@@ -0,0 +1,129 @@
+"""
+Wall time of DocumentAnalyzer's single-call path vs chunked map-reduce, by page count.
+
+The LLM is a local stub whose latency follows a simple serving model:
+
+    latency = overhead + prefill(input tokens) + output tokens * per-token decode
+
+where prefill grows superlinearly with prompt length (attention cost), and a
+prompt longer than --context-tokens fails as a real provider would. Map calls
+emit short notes, reduce and single calls emit the Metadata JSON. Times are
+multiplied by --time-scale so the sweep finishes quickly; reported numbers are
+divided back to model seconds.
+
+    python -m benchmarks.analysis_map_reduce --pages 8 32 128 512 --concurrency 4 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")  # ModelLoader checks these; the stub LLM needs none
+os.environ.setdefault("GROQ_API_KEY", "unused")
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, BaseMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+from src.document_analyzer.data_analysis import DocumentAnalyzer  # noqa: E402
+from utils.tokens import estimate_tokens  # noqa: E402
+
+WORDS = ("contract supplier delivery schedule payment invoice warranty liability termination notice "
+         "clause party agreement period service level penalty audit confidential").split()
+
+METADATA = {
+    "Summary": ["Synthetic agreement between two parties."], "Title": "Benchmark Agreement",
+    "Author": ["Not Available"], "DateCreated": "Not Available", "LastModifiedDate": "Not Available",
+    "Publisher": "Not Available", "Language": "English", "PageCount": 0, "SentimentTone": "Neutral",
+}
+
+
+class StubLLM(BaseChatModel):
+    overhead_s: float = 0.4
+    prefill_tokens_per_s: float = 20_000.0
+    attention_tokens: float = 32_000.0  # prefill cost doubles per this many prompt tokens
+    decode_s_per_token: float = 0.01
+    context_tokens: int = 128_000
+    time_scale: float = 0.02
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-stub"
+
+    def _respond(self, messages: List[BaseMessage]):
+        prompt = "".join(str(m.content) for m in messages)
+        n = estimate_tokens(prompt)
+        if n > self.context_tokens:
+            raise ValueError(f"prompt of {n} tokens exceeds the {self.context_tokens}-token context window")
+        text = json.dumps(METADATA) if "Return ONLY valid JSON" in prompt else "Notes: payment and delivery terms. " * 8
+        prefill = n / self.prefill_tokens_per_s * (1 + n / self.attention_tokens)
+        delay = self.overhead_s + prefill + estimate_tokens(text) * self.decode_s_per_token
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(text))]), delay * self.time_scale
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        result, delay = self._respond(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        result, delay = self._respond(messages)
+        await asyncio.sleep(delay)
+        return result
+
+
+def document(pages: int, tokens_per_page: int) -> str:
+    body = " ".join(WORDS[i % len(WORDS)] for i in range(tokens_per_page))[: tokens_per_page * 4]
+    return "\n".join(f"\n--- Page {p} ---\n{body}" for p in range(1, pages + 1))
+
+
+async def timed(analyzer: DocumentAnalyzer, text: str, scale: float):
+    analyzer.llm.calls = 0
+    start = time.perf_counter()
+    try:
+        await analyzer.aanalyze_document(text)
+    except Exception:
+        return None, analyzer.llm.calls
+    return (time.perf_counter() - start) / scale, analyzer.llm.calls
+
+
+async def main(args) -> int:
+    llm = StubLLM(time_scale=args.time_scale, context_tokens=args.context_tokens)
+    print(f"{args.tokens_per_page} tokens/page, chunk_tokens={args.chunk_tokens}, "
+          f"context={args.context_tokens}; model seconds\n")
+    header = f"{'pages':>6s} {'tokens':>8s} {'single s':>9s}"
+    header += "".join(f" {'map-reduce c=' + str(c):>17s} {'calls':>6s}" for c in args.concurrency)
+    print(header)
+    for pages in args.pages:
+        text = document(pages, args.tokens_per_page)
+        analyzer = DocumentAnalyzer(llm=llm)
+        analyzer.single_call_tokens = 10 ** 9
+        single, _ = await timed(analyzer, text, args.time_scale)
+        row = f"{pages:6d} {estimate_tokens(text):8d} {single:9.1f}" if single else \
+            f"{pages:6d} {estimate_tokens(text):8d} {'too long':>9s}"
+        for c in args.concurrency:
+            analyzer.single_call_tokens, analyzer.chunk_tokens, analyzer.max_concurrency = 0, args.chunk_tokens, c
+            chunked, calls = await timed(analyzer, text, args.time_scale)
+            row += f" {chunked:17.1f} {calls:6d}"
+        print(row)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[8, 32, 128, 512])
+    parser.add_argument("--tokens-per-page", type=int, default=600)
+    parser.add_argument("--chunk-tokens", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--context-tokens", type=int, default=128_000)
+    parser.add_argument("--time-scale", type=float, default=0.02)
+    sys.exit(asyncio.run(main(parser.parse_args())))
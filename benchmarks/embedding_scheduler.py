@@ -0,0 +1,126 @@
+"""
+Embedding throughput through EmbeddingScheduler against a local fake endpoint.
+
+A threaded HTTP server stands in for the embedding API: every request takes
+--latency seconds whatever its size, and the server counts the requests it
+answers. The same texts are embedded with
+
+  per-item       batch_size=1, max_concurrency=1 (one request per chunk)
+  batched        batch_size=--batch-size, max_concurrency=1
+  concurrent     batch_size=--batch-size, max_concurrency=--concurrency
+  paced          concurrent, capped at --rps requests/second (burst --burst)
+
+Exits non-zero if any batched configuration is not faster than per-item calls,
+if the paced run exceeds its request rate, or if any vector count is wrong.
+
+    python -m benchmarks.embedding_scheduler --texts 400 --latency 0.02
+"""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from utils.embedding_scheduler import EmbeddingScheduler  # noqa: E402
+
+DIM = 64
+
+
+def start_endpoint(latency_s: float):
+    requests = {"count": 0}
+    lock = threading.Lock()
+
+    class FakeEndpoint(BaseHTTPRequestHandler):
+        def do_POST(self):
+            texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["texts"]
+            with lock:
+                requests["count"] += 1
+            time.sleep(latency_s)
+            body = json.dumps({"vectors": [
+                [b / 255 for b in hashlib.sha256(t.encode()).digest()] * (DIM // 32) for t in texts
+            ]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests
+
+
+class HttpEmbeddings(Embeddings):
+    def __init__(self, url: str):
+        self.url = url
+
+    def embed_documents(self, texts):
+        req = urllib.request.Request(self.url, data=json.dumps({"texts": texts}).encode(),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req) as resp:
+            return json.loads(resp.read())["vectors"]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def main(args) -> int:
+    server, requests = start_endpoint(args.latency)
+    client = HttpEmbeddings(f"http://127.0.0.1:{server.server_address[1]}/embed")
+    texts = [f"chunk {i}" for i in range(args.texts)]
+    configs = [
+        ("per-item", EmbeddingScheduler(client, batch_size=1, max_concurrency=1)),
+        ("batched", EmbeddingScheduler(client, batch_size=args.batch_size, max_concurrency=1)),
+        ("concurrent", EmbeddingScheduler(client, batch_size=args.batch_size, max_concurrency=args.concurrency)),
+        ("paced", EmbeddingScheduler(client, batch_size=args.batch_size, max_concurrency=args.concurrency,
+                                     requests_per_second=args.rps, burst=args.burst)),
+    ]
+
+    failures = []
+    elapsed = {}
+    print(f"{len(texts)} texts, {args.latency * 1000:.0f} ms per request\n")
+    print(f"{'config':>11s} {'seconds':>8s} {'texts/s':>9s} {'requests':>9s} {'req/s':>7s}")
+    for label, emb in configs:
+        before = requests["count"]
+        start = time.perf_counter()
+        vectors = emb.embed_documents(texts)
+        elapsed[label] = time.perf_counter() - start
+        sent = requests["count"] - before
+        rate = sent / elapsed[label]
+        print(f"{label:>11s} {elapsed[label]:8.2f} {len(texts) / elapsed[label]:9.0f} {sent:9d} {rate:7.1f}")
+        if len(vectors) != len(texts):
+            failures.append(f"{label}: {len(vectors)} vectors for {len(texts)} texts")
+        if label == "paced" and sent > args.burst and (sent - args.burst) / elapsed[label] > args.rps * 1.1:
+            failures.append(f"paced: {rate:.1f} req/s exceeds the {args.rps} req/s cap")
+    server.shutdown()
+
+    for label in ("batched", "concurrent", "paced"):
+        if elapsed[label] >= elapsed["per-item"]:
+            failures.append(f"{label} ({elapsed[label]:.2f}s) is not faster than per-item "
+                            f"({elapsed['per-item']:.2f}s)")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake endpoint request")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rps", type=float, default=20.0, help="request cap for the paced run")
+    parser.add_argument("--burst", type=float, default=2.0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,118 @@
+"""
+Compare opening a FAISS index in memory vs memory-mapped read-only.
+
+Builds a synthetic index directory (random vectors, short texts) in the
+compact layout, then opens it in a fresh subprocess per mode and reports load
+time, first-query latency and RSS growth split into private (anonymous) memory,
+which every uvicorn worker pays separately, and file-backed pages, which the OS
+page cache shares between workers.
+
+    python -m benchmarks.faiss_mmap_load --vectors 100000 --dim 768 --index-type flat
+    python -m benchmarks.faiss_mmap_load --index-type ivf
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def rss_mb() -> dict:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, value, _ = line.split()
+                fields[name.rstrip(":")] = int(value) / 1024
+    return fields
+
+
+def build(index_dir: Path, vectors: int, dim: int, index_type: str):
+    import faiss
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from utils.segmented_index import write_base
+
+    rng = np.random.default_rng(0)
+    x = rng.random((vectors, dim), dtype=np.float32)
+    if index_type == "ivf":
+        index = faiss.index_factory(dim, f"IVF{max(1, int(vectors ** 0.5))},Flat")
+        index.train(x[: min(vectors, 50_000)])
+    else:
+        index = faiss.IndexFlatL2(dim)
+    index.add(x)
+    ids = [str(i) for i in range(vectors)]
+    docstore = InMemoryDocstore({
+        i: Document(page_content=f"synthetic chunk {i}", metadata={"source": f"doc{int(i) % 50}.pdf"}) for i in ids
+    })
+    write_base(index_dir, FAISS(DeterministicFakeEmbedding(size=dim), index, docstore, dict(enumerate(ids))))
+
+
+def child(index_dir: str, mmap: bool, dim: int):
+    import numpy as np
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from utils.segmented_index import load_segmented
+
+    query = np.random.default_rng(1).random(dim, dtype=np.float32).tolist()
+    before = rss_mb()
+    start = time.perf_counter()
+    vs = load_segmented(index_dir, DeterministicFakeEmbedding(size=dim), mmap=mmap)
+    load_ms = (time.perf_counter() - start) * 1000
+    after_load = rss_mb()
+    start = time.perf_counter()
+    hits = vs.similarity_search_by_vector(query, k=5)
+    first_query_ms = (time.perf_counter() - start) * 1000
+    after_query = rss_mb()
+    print(json.dumps({
+        "load_ms": load_ms,
+        "first_query_ms": first_query_ms,
+        "hits": len(hits),
+        "private_mb_after_load": after_load["RssAnon"] - before["RssAnon"],
+        "private_mb_after_query": after_query["RssAnon"] - before["RssAnon"],
+        "shared_mb_after_query": after_query["RssFile"] - before["RssFile"],
+    }))
+
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory(prefix="faiss_mmap_") as tmp:
+        index_dir = Path(tmp) / "index"
+        index_dir.mkdir()
+        start = time.perf_counter()
+        build(index_dir, args.vectors, args.dim, args.index_type)
+        size_mb = (index_dir / "index.faiss").stat().st_size / 2**20
+        print(f"built {args.index_type} index: {args.vectors} x {args.dim} "
+              f"({size_mb:.0f} MiB) in {time.perf_counter() - start:.1f}s\n")
+        print(f"{'mode':10s} {'load ms':>9s} {'1st query ms':>13s} {'private MiB':>12s} {'shared MiB':>11s}")
+        for mode in ("in-memory", "mmap"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", str(index_dir), "--dim", str(args.dim)]
+                + (["--mmap"] if mode == "mmap" else []),
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            print(f"{mode:10s} {r['load_ms']:9.1f} {r['first_query_ms']:13.1f} "
+                  f"{r['private_mb_after_query']:12.1f} {r['shared_mb_after_query']:11.1f}")
+    print("\nprivate = RssAnon growth (paid by every worker); shared = RssFile growth (page cache, shared).")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--index-type", choices=("flat", "ivf"), default="flat")
+    parser.add_argument("--child", metavar="INDEX_DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--mmap", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.mmap, args.dim)
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,103 @@
+"""
+Check that /health stays fast while slow /analyze requests are in flight.
+
+The LLM is replaced by a stub that takes LLM_DELAY_S per call, so the check
+needs no API keys. Every upload gets distinct bytes, so the /analyze result
+cache and the extraction cache cannot answer from the warm-up. Exits non-zero
+if any /health probe exceeds the budget or too few probes ran to tell.
+
+    python -m benchmarks.health_under_load
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")
+os.environ.setdefault("GROQ_API_KEY", "unused")
+
+SAMPLE_PDF = ROOT / "data" / "document_analysis" / "NIPS-2017-attention-is-all-you-need-Paper.pdf"
+METADATA = {
+    "Summary": ["stub"], "Title": "stub", "Author": ["stub"], "DateCreated": "n/a",
+    "LastModifiedDate": "n/a", "Publisher": "n/a", "Language": "en", "PageCount": 1, "SentimentTone": "neutral",
+}
+
+
+def install_slow_llm(delay_s: float):
+    from langchain_core.runnables import RunnableLambda
+    import utils.model_loader as model_loader
+
+    def slow(_):
+        time.sleep(delay_s)
+        return json.dumps(METADATA)
+
+    async def aslow(_):
+        await asyncio.sleep(delay_s)
+        return json.dumps(METADATA)
+
+    stub = RunnableLambda(slow, afunc=aslow)
+    model_loader.ModelRegistry.get_llm = lambda self, provider_key: stub
+
+
+async def main(args) -> int:
+    import httpx
+    from api.main import app
+
+    pdf = SAMPLE_PDF.read_bytes()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        uploads = itertools.count()
+
+        async def analyze():
+            # a trailing PDF comment changes the sha256 without changing the document
+            body = pdf + f"\n%bench-{next(uploads)}\n".encode()
+            r = await client.post("/analyze", files={"file": ("sample.pdf", body, "application/pdf")})
+            assert r.headers.get("X-Cache") != "hit", "/analyze answered from the result cache"
+            r.raise_for_status()
+
+        await analyze()  # warm up imports, clients and pools before measuring
+        slow = [asyncio.create_task(analyze()) for _ in range(args.concurrency)]
+        latencies = []
+        while not all(t.done() for t in slow):
+            # measured from when the probe was due, so event-loop stalls count against /health
+            due = time.perf_counter() + args.interval
+            await asyncio.sleep(args.interval)
+            r = await client.get("/health")
+            latencies.append((time.perf_counter() - due) * 1000)
+            assert r.status_code == 200
+        await asyncio.gather(*slow)
+
+    if len(latencies) < args.min_samples:
+        print(f"/health samples={len(latencies)} < {args.min_samples}: /analyze finished too fast to measure")
+        return 1
+    latencies.sort()
+    p95 = latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)]
+    print(f"/analyze x{args.concurrency} with {args.llm_delay}s LLM stub")
+    print(f"/health samples={len(latencies)} p50={statistics.median(latencies):.1f}ms "
+          f"p95={p95:.1f}ms max={latencies[-1]:.1f}ms (budget max < {args.budget_ms}ms)")
+    return 0 if latencies[-1] < args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-delay", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--min-samples", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="health_bench_")
+    os.chdir(workdir)  # keep uploads/caches out of the repo
+    os.environ["DATA_STORAGE_PATH"] = str(Path(workdir) / "data" / "document_analysis")
+    install_slow_llm(args.llm_delay)
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,132 @@
+"""
+Compare vector-only retrieval with the BM25 + FAISS hybrid retriever.
+
+Builds a synthetic contract corpus in a temp directory: each chunk has a clause
+number ("Clause 3.14.2"), a part code ("PC-31402") and a few topical words. Two
+query sets are scored by hit@k (is the target chunk in the top k):
+
+    identifier  "what does clause 3.14.2 require?" / "terms for PC-31402"
+    topical     a subset of the target chunk's topical words
+
+The embedding is a local hashed bag-of-words that, like most sentence
+embedding models, carries little signal for numeric identifiers (tokens with
+digits are dropped). That keeps the run offline and deterministic; with a real
+model the absolute numbers differ but the identifier gap is the point.
+
+    python -m benchmarks.hybrid_retrieval --chunks 20000 --queries 200 --k 5
+"""
+import argparse
+import hashlib
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from src.document_chat.hybrid_retrieval import HybridRetriever  # noqa: E402
+from utils.bm25_index import BM25_FILE, BM25Index  # noqa: E402
+from utils.segmented_index import load_segmented, write_base  # noqa: E402
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+class HashedWordEmbedding(Embeddings):
+    """Normalized hashed bag of alphabetic words; digits carry no signal."""
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+            v[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        n = np.linalg.norm(v)
+        return (v / n if n else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def corpus(n: int, rng: np.random.Generator):
+    vocab = ["".join(rng.choice(list("abcdefghijklmnopqrstuvwxyz"), 7)) for _ in range(3000)]
+    texts, topics = [], []
+    for i in range(n):
+        clause = f"{i % 17}.{i // 17 % 50}.{i // 850}"
+        words = list(rng.choice(vocab, 4, replace=False))
+        topics.append(words)
+        texts.append(f"Clause {clause} governs delivery of part PC-{i:05d}; "
+                     f"the supplier shall {' '.join(words)} within the agreed period.")
+    return texts, topics
+
+
+def queries(texts: List[str], topics, count: int, rng: np.random.Generator):
+    targets = rng.choice(len(texts), count, replace=False)
+    ident, topical = [], []
+    for j, t in enumerate(targets):
+        clause = texts[t].split()[1]
+        ident.append((f"what does clause {clause} require?" if j % 2 else f"delivery terms for PC-{t:05d}", t))
+        topical.append((" ".join(topics[t][:3]), t))
+    return ident, topical
+
+
+def evaluate(retriever, store, qs, k: int):
+    hits, latencies = 0, []
+    for q, target in qs:
+        t = time.perf_counter()
+        docs = retriever.invoke(q)
+        latencies.append((time.perf_counter() - t) * 1000)
+        hits += any(d.page_content == store[target] for d in docs[:k])
+    return hits / len(qs), statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1]
+
+
+def main(args) -> int:
+    rng = np.random.default_rng(0)
+    texts, topics = corpus(args.chunks, rng)
+    ident, topical = queries(texts, topics, args.queries, rng)
+    emb = HashedWordEmbedding(args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        write_base(tmp, FAISS.from_texts(texts, emb))
+        dense_s = time.perf_counter() - start
+        start = time.perf_counter()
+        bm25 = BM25Index(Path(tmp) / BM25_FILE)
+        bm25.add(0, texts)
+        lexical_s = time.perf_counter() - start
+        vs = load_segmented(tmp, emb)
+
+        retrievers = {
+            "vector": vs.as_retriever(search_kwargs={"k": args.k}),
+            "hybrid": HybridRetriever.from_config(vs, bm25, args.k, {"fetch_k": args.fetch_k}),
+        }
+        print(f"{args.chunks} chunks, {args.queries} queries per set, k={args.k}")
+        print(f"index build: dense {dense_s:.1f}s, bm25 {lexical_s:.1f}s\n")
+        print(f"{'retriever':10s} {'query set':11s} {'hit@k':>6s} {'p50 ms':>7s} {'p95 ms':>7s}")
+        for name, retriever in retrievers.items():
+            for label, qs in (("identifier", ident), ("topical", topical)):
+                hit, p50, p95 = evaluate(retriever, texts, qs, args.k)
+                print(f"{name:10s} {label:11s} {hit:6.3f} {p50:7.2f} {p95:7.2f}")
+        bm25.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""
+Compare the index types in utils/index_types.py on synthetic embeddings.
+
+Vectors are drawn around random cluster centres (closer to real embedding
+distributions than uniform noise) and L2-normalized. For each type the script
+reports build time, recall@k against exact flat search, single-query latency
+and stored bytes per vector.
+
+    python -m benchmarks.index_types --vectors 100000 --dim 768 --k 10
+    python -m benchmarks.index_types --types flat ivf_flat ivf_pq --nprobe 32
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from utils.index_types import INDEX_TYPES, apply_search_params, build_index, finalize_index  # noqa: E402
+
+
+def synthetic(n: int, dim: int, clusters: int, spread: float, rng: np.random.Generator) -> np.ndarray:
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    x = centres[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim), dtype=np.float32)
+    faiss.normalize_L2(x)
+    return x
+
+
+def main(args) -> int:
+    rng = np.random.default_rng(0)
+    data = synthetic(args.vectors + args.queries, args.dim, args.clusters, args.spread, rng)
+    x, queries = data[: args.vectors], data[args.vectors:]
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(x)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+    print(f"{'type':10s} {'factory':22s} {'build s':>8s} {'recall@k':>9s} {'p50 ms':>7s} {'p95 ms':>7s} {'bytes/vec':>10s}")
+    for kind in args.types:
+        spec = {"type": kind, "nprobe": args.nprobe, "ef_search": args.ef_search, "pq_m": args.pq_m,
+                "hnsw_m": args.hnsw_m, "min_train_vectors": 0}
+        start = time.perf_counter()
+        index, factory = build_index(spec, x)
+        index.add(x)
+        finalize_index(index)
+        build_s = time.perf_counter() - start
+        apply_search_params(index, spec)
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i in range(args.queries):
+            t = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], args.k)
+            latencies.append((time.perf_counter() - t) * 1000)
+            found[i] = ids[0]
+        recall = np.mean([len(set(found[i]) & set(truth[i])) / args.k for i in range(args.queries)])
+        bytes_per_vector = faiss.serialize_index(index).size / args.vectors
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{kind:10s} {factory:22s} {build_s:8.1f} {recall:9.3f} {statistics.median(latencies):7.2f} "
+              f"{p95:7.2f} {bytes_per_vector:10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.35, help="within-cluster noise; higher is harder")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--pq-m", type=int, default=64)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""
+Chunking cost and chunk sizes: ChatIngestor's previous splitter vs PageTextSplitter.
+
+Loads the sample corpus (PDF, DOCX and TXT in data/multi_doc_chat by default)
+with load_documents, then splits the pages with
+
+  chars        RecursiveCharacterTextSplitter(chunk_size, chunk_overlap), built
+               per call and measuring characters (what _split did before)
+  chars+tok    the same splitter with the token-length function, the drop-in
+               way to make it token-aware
+  page-token   utils.text_splitter.PageTextSplitter with the equivalent token
+               budget, fed the pages lazily
+
+--scale repeats the pages (with each copy's lines tagged, so nothing is
+counted from the memo twice). Times are the best of --repeat runs with the
+token-count memo cleared before each run. Chunk sizes are measured with the same tokenizer for every splitter;
+"over" counts chunks above the token budget.
+
+    python -m benchmarks.text_splitter --scale 20 --repeat 5
+"""
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+from utils.document_ops import load_documents  # noqa: E402
+from utils.text_splitter import PageTextSplitter  # noqa: E402
+from utils.tokens import chars_to_tokens, count_tokens, tokenizer_name  # noqa: E402
+
+
+def char_split(docs, chunk_size, chunk_overlap):
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_documents(docs)
+
+
+def char_token_split(docs, chunk_size, chunk_overlap):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chars_to_tokens(chunk_size),
+                                              chunk_overlap=chars_to_tokens(chunk_overlap),
+                                              length_function=count_tokens)
+    return splitter.split_documents(docs)
+
+
+def page_token_split(docs, chunk_size, chunk_overlap):
+    splitter = PageTextSplitter(chars_to_tokens(chunk_size), chars_to_tokens(chunk_overlap))
+    return list(splitter.iter_documents(iter(docs)))
+
+
+def scaled(docs, scale):
+    """scale copies of the pages, each line tagged with its copy number so the token memo sees no repeats."""
+    out = list(docs)
+    for i in range(1, scale):
+        out.extend(Document(page_content=re.sub(r"(?m)^", f"{i} ", d.page_content), metadata=dict(d.metadata))
+                   for d in docs)
+    return out
+
+
+SPLITTERS = {"chars": char_split, "chars+tok": char_token_split, "page-token": page_token_split}
+
+
+def main(args) -> int:
+    paths = sorted(p for p in Path(args.data).iterdir() if p.suffix.lower() in {".pdf", ".docx", ".txt"})
+    docs = scaled(load_documents(paths), args.scale)
+    chars = sum(len(d.page_content) for d in docs)
+    budget = chars_to_tokens(args.chunk_size)
+    print(f"{len(paths)} files x{args.scale}: {len(docs)} pages, {chars / 1e6:.2f}M chars; "
+          f"chunk_size={args.chunk_size} chars / {budget} tokens; tokenizer={tokenizer_name()}\n")
+    print(f"{'splitter':>10s} {'best ms':>9s} {'chunks':>7s} {'tok p50':>8s} {'tok p95':>8s} "
+          f"{'tok max':>8s} {'over':>6s} {'pages ok':>9s}")
+    for name, split in SPLITTERS.items():
+        best = None
+        for _ in range(args.repeat):
+            count_tokens.cache_clear()
+            start = time.perf_counter()
+            chunks = split(docs, args.chunk_size, args.chunk_overlap)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        sizes = sorted(count_tokens(c.page_content) for c in chunks)
+        pages_ok = all("source" in c.metadata for c in chunks) and \
+            {c.metadata.get("page") for c in chunks} == {d.metadata.get("page") for d in docs}
+        print(f"{name:>10s} {best:9.1f} {len(chunks):7d} {statistics.median(sizes):8.0f} "
+              f"{sizes[int(len(sizes) * 0.95)]:8d} {sizes[-1]:8d} {sum(s > budget for s in sizes):6d} "
+              f"{str(pages_ok):>9s}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(ROOT / "data" / "multi_doc_chat"))
+    parser.add_argument("--scale", type=int, default=20, help="repeat the loaded pages this many times")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="characters, as the API takes it")
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    sys.exit(main(parser.parse_args()))
@@ -24,4 +24,8 @@ class PromptType(str, Enum):
     DOCUMENT_ANALYSIS = "document_analysis"
     DOCUMENT_COMPARISON = "document_comparison"
     CONTEXTUALIZE_QUESTION = "contextualize_question"
-    CONTEXT_QA = "context_qa"
\ No newline at end of file
+    CONTEXT_QA = "context_qa"
+    CHAT_SUMMARY = "chat_summary"
+    DOCUMENT_CHUNK_SUMMARY = "document_chunk_summary"
+    DOCUMENT_ANALYSIS_REDUCE = "document_analysis_reduce"
+    PAGE_COMPARISON = "page_comparison"
\ No newline at end of file
@@ -29,6 +29,39 @@ Your response should follow this format:
 {format_instruction}
 """)
 
+# Prompt for one changed page pair found by the local page diff
+page_comparison_prompt = ChatPromptTemplate.from_template("""
+Below is a line diff between page {ref_page} of a reference PDF and page {act_page} of its revised version
+("-" lines were removed, "+" lines were added, other lines are context).
+Describe what changed in one to three short sentences: added, removed or modified content and any changed
+figures, dates or names. Ignore pure formatting or whitespace changes. Reply with the description only.
+
+{diff}
+""")
+
+# Map step of chunked document analysis: notes for one page range
+document_chunk_summary_prompt = ChatPromptTemplate.from_template("""
+You are reading pages {first_page}-{last_page} of a longer document.
+Write concise notes on this part: its main points, and any title, author, creation or
+modification dates, publisher, language and tone you can find. Say "not stated" for anything absent.
+Do not invent details.
+
+{document_text}
+""")
+
+# Reduce step of chunked document analysis: metadata from the per-range notes
+document_analysis_reduce_prompt = ChatPromptTemplate.from_template("""
+You are a highly capable assistant trained to analyze and summarize documents.
+The document has {page_count} pages and was read in parts; below are notes on each page range, in order.
+Combine them into one analysis of the whole document.
+Return ONLY valid JSON matching the exact schema below.
+
+{format_instructions}
+
+Notes:
+{document_text}
+""")
+
 # Prompt for contextual question rewriting
 contextualize_question_prompt = ChatPromptTemplate.from_messages([
     ("system", (
@@ -51,10 +84,27 @@ context_qa_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}"),
 ])
 
+# Prompt for folding older chat turns into a rolling summary
+chat_summary_prompt = ChatPromptTemplate.from_template("""
+Update the running summary of a conversation between a user and a document assistant.
+Keep the facts, names, numbers and open questions the user may refer back to; drop pleasantries.
+Reply with the updated summary only, in at most {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+New conversation turns:
+{conversation}
+""")
+
 # Central dictionary to register prompts
 PROMPT_REGISTRY = {
     "document_analysis": document_analysis_prompt,
     "document_comparison": document_comparison_prompt,
+    "page_comparison": page_comparison_prompt,
     "contextualize_question": contextualize_question_prompt,
     "context_qa": context_qa_prompt,
+    "chat_summary": chat_summary_prompt,
+    "document_chunk_summary": document_chunk_summary_prompt,
+    "document_analysis_reduce": document_analysis_reduce_prompt,
 }
\ No newline at end of file
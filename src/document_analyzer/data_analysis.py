@@ -1,29 +1,89 @@
 import os
+import re
 import sys
+from typing import Any, Dict, List, Optional, Tuple
 from utils.model_loader import ModelLoader
+from utils.tokens import estimate_tokens
+from utils.result_cache import model_id, prompt_version
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 from model.models import *
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain.output_parsers import OutputFixingParser
 from prompt.prompt_library import PROMPT_REGISTRY # type: ignore
 
+DEFAULT_SINGLE_CALL_TOKENS = 24000
+DEFAULT_CHUNK_TOKENS = 8000
+DEFAULT_MAX_CONCURRENCY = 4
+ANALYSIS_VERSION = 1  # bump when chunking or reduction changes, to retire cached results
+
+# page markers written by DocHandler.read_pdf / DocumentComparator.read_pdf
+_PAGE_RE = re.compile(r"^\s*---\s*Page\s+(\d+)\s*---\s*$", re.MULTILINE)
+
+Chunk = Tuple[int, int, str]  # (first page, last page, text)
+
+
+def split_pages(document_text: str) -> List[Tuple[int, str]]:
+    """(page number, text) for each `--- Page N ---` section; the whole text as page 1 without markers."""
+    marks = list(_PAGE_RE.finditer(document_text))
+    if not marks:
+        return [(1, document_text)]
+    pages = []
+    for i, m in enumerate(marks):
+        end = marks[i + 1].start() if i + 1 < len(marks) else len(document_text)
+        pages.append((int(m.group(1)), document_text[m.end():end].strip()))
+    return pages
+
+
+def page_chunks(pages: List[Tuple[int, str]], budget_tokens: int) -> List[Chunk]:
+    """Consecutive pages grouped up to budget_tokens; a page over budget is cut into pieces."""
+    budget_chars = budget_tokens * 4
+    chunks: List[Chunk] = []
+    first, last, parts, size = None, None, [], 0
+    for number, text in pages:
+        section = f"--- Page {number} ---\n{text}"
+        if parts and size + estimate_tokens(section) > budget_tokens:
+            chunks.append((first, last, "\n\n".join(parts)))
+            parts, size = [], 0
+        if estimate_tokens(section) > budget_tokens:
+            chunks.extend((number, number, section[i:i + budget_chars]) for i in range(0, len(section), budget_chars))
+            continue
+        if not parts:
+            first = number
+        parts.append(section)
+        last, size = number, size + estimate_tokens(section)
+    if parts:
+        chunks.append((first, last, "\n\n".join(parts)))
+    return chunks
+
+
 class DocumentAnalyzer:
     """
     Analyzes documents using a pre-trained model.
     Automatically logs all actions and supports session-based organization.
+
+    Documents over `analysis.single_call_tokens` are analyzed map-reduce: page
+    ranges within `analysis.chunk_tokens` are summarized concurrently (at most
+    `analysis.max_concurrency` at once), then the notes are reduced into Metadata.
     """
-    def __init__(self):
+    def __init__(self, llm=None):
         self.log = CustomLogger().get_logger(__name__)
         try:
             self.loader=ModelLoader()
-            self.llm=self.loader.load_llm()
+            self.llm=llm or self.loader.load_llm()
             
             # Prepare parsers
             self.parser = JsonOutputParser(pydantic_object=Metadata)
             self.fixing_parser = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
             
             self.prompt = PROMPT_REGISTRY["document_analysis"]
+            self.chunk_prompt = PROMPT_REGISTRY[PromptType.DOCUMENT_CHUNK_SUMMARY.value]
+            self.reduce_prompt = PROMPT_REGISTRY[PromptType.DOCUMENT_ANALYSIS_REDUCE.value]
+
+            cfg = self.loader.config.get("analysis", {}) or {}
+            self.single_call_tokens = int(cfg.get("single_call_tokens", DEFAULT_SINGLE_CALL_TOKENS))
+            self.chunk_tokens = int(cfg.get("chunk_tokens", DEFAULT_CHUNK_TOKENS))
+            self.max_concurrency = int(cfg.get("max_concurrency", DEFAULT_MAX_CONCURRENCY))
             
             self.log.info("DocumentAnalyzer initialized successfully")
             
@@ -39,6 +99,9 @@ class DocumentAnalyzer:
         Analyze a document's text and extract structured metadata & summary.
         """
         try:
+            if estimate_tokens(document_text) > self.single_call_tokens:
+                return self._map_reduce(document_text)
+
             chain = self.prompt | self.llm | self.fixing_parser
             
             self.log.info("Meta-data analysis chain initialized")
@@ -55,5 +118,94 @@ class DocumentAnalyzer:
         except Exception as e:
             self.log.error("Metadata analysis failed", error=str(e))
             raise DocumentPortalException("Metadata extraction failed",sys)
-        
-    
\ No newline at end of file
+
+    async def aanalyze_document(self, document_text:str)-> dict:
+        """
+        Async variant of analyze_document (uses chain.ainvoke; does not block the event loop).
+        """
+        try:
+            if estimate_tokens(document_text) > self.single_call_tokens:
+                return await self._amap_reduce(document_text)
+
+            chain = self.prompt | self.llm | self.fixing_parser
+
+            response = await chain.ainvoke({
+                "format_instructions": self.parser.get_format_instructions(),
+                "document_text": document_text
+            })
+
+            self.log.info("Metadata extraction successful", keys=list(response.keys()))
+
+            return response
+
+        except Exception as e:
+            self.log.error("Metadata analysis failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed",sys)
+
+    def result_key(self, sha256: str) -> Dict[str, Any]:
+        """Cache key for analyzing the file with this content hash under the current model, prompts and chunking."""
+        return {
+            "sha256": sha256,
+            "prompt": prompt_version(self.prompt, self.chunk_prompt, self.reduce_prompt),
+            "pipeline": [ANALYSIS_VERSION, self.single_call_tokens, self.chunk_tokens],
+            "model": model_id(self.llm),
+        }
+
+    # ---------- Map-reduce ----------
+
+    def _map_inputs(self, chunks: List[Chunk]) -> List[Dict[str, Any]]:
+        return [{"first_page": a, "last_page": b, "document_text": text} for a, b, text in chunks]
+
+    def _notes_text(self, chunks: List[Chunk], notes: List[str]) -> str:
+        return "\n\n".join(f"[Pages {a}-{b}]\n{n.strip()}" for (a, b, _), n in zip(chunks, notes))
+
+    def _reduce_input(self, notes_text: str, page_count: int) -> Dict[str, Any]:
+        return {
+            "format_instructions": self.parser.get_format_instructions(),
+            "page_count": page_count,
+            "document_text": notes_text,
+        }
+
+    def _collapse_chunks(self, chunks: List[Chunk], notes: List[str]) -> Optional[List[Chunk]]:
+        """Notes regrouped for another map pass if they are still too long for one reduce call."""
+        notes_text = self._notes_text(chunks, notes)
+        if estimate_tokens(notes_text) <= self.single_call_tokens:
+            return None
+        sections = [(a, b, f"[Pages {a}-{b}]\n{n.strip()}") for (a, b, _), n in zip(chunks, notes)]
+        grouped: List[Chunk] = []
+        for a, b, text in sections:
+            if grouped and estimate_tokens(grouped[-1][2] + text) <= self.chunk_tokens:
+                grouped[-1] = (grouped[-1][0], b, grouped[-1][2] + "\n\n" + text)
+            else:
+                grouped.append((a, b, text))
+        return grouped if len(grouped) < len(chunks) else None
+
+    def _map_reduce(self, document_text: str) -> dict:
+        pages = split_pages(document_text)
+        chunks = page_chunks(pages, self.chunk_tokens)
+        self.log.info("Chunked analysis started", pages=len(pages), chunks=len(chunks))
+        summarize = self.chunk_prompt | self.llm | StrOutputParser()
+        config = {"max_concurrency": self.max_concurrency}
+        notes = summarize.batch(self._map_inputs(chunks), config=config)
+        while (collapsed := self._collapse_chunks(chunks, notes)) is not None:
+            chunks, notes = collapsed, summarize.batch(self._map_inputs(collapsed), config=config)
+        chain = self.reduce_prompt | self.llm | self.fixing_parser
+        response = chain.invoke(self._reduce_input(self._notes_text(chunks, notes), len(pages)))
+        self.log.info("Metadata extraction successful", keys=list(response.keys()), pages=len(pages),
+                      chunks=len(chunks))
+        return response
+
+    async def _amap_reduce(self, document_text: str) -> dict:
+        pages = split_pages(document_text)
+        chunks = page_chunks(pages, self.chunk_tokens)
+        self.log.info("Chunked analysis started", pages=len(pages), chunks=len(chunks))
+        summarize = self.chunk_prompt | self.llm | StrOutputParser()
+        config = {"max_concurrency": self.max_concurrency}
+        notes = await summarize.abatch(self._map_inputs(chunks), config=config)
+        while (collapsed := self._collapse_chunks(chunks, notes)) is not None:
+            chunks, notes = collapsed, await summarize.abatch(self._map_inputs(collapsed), config=config)
+        chain = self.reduce_prompt | self.llm | self.fixing_parser
+        response = await chain.ainvoke(self._reduce_input(self._notes_text(chunks, notes), len(pages)))
+        self.log.info("Metadata extraction successful", keys=list(response.keys()), pages=len(pages),
+                      chunks=len(chunks))
+        return response
@@ -0,0 +1,77 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from utils.bm25_index import BM25Index
+from utils.concurrency import run_blocking
+from utils.segmented_index import SegmentedVectorStore
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses dense (FAISS) and lexical (BM25) candidates by relative score: each
+    side's scores are min-max scaled to [0, 1] over its own candidates, then
+    combined as dense_weight * dense + lexical_weight * lexical. Unlike rank
+    fusion this keeps BM25's margin for an exact identifier match (clause
+    numbers, part codes) that the embedding ranks poorly. Without a BM25 side
+    (missing or out of sync) documents score on the dense side alone, as any
+    document without a lexical match does, so fused() stays on the same scale.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: SegmentedVectorStore
+    bm25: Optional[BM25Index] = None
+    k: int = 5
+    fetch_k: int = 50
+    dense_weight: float = 0.5
+    lexical_weight: float = 0.5
+
+    @classmethod
+    def from_config(cls, vectorstore: SegmentedVectorStore, bm25: Optional[BM25Index], k: int,
+                    cfg: Optional[Dict[str, Any]]) -> "HybridRetriever":
+        cfg = cfg or {}
+        return cls(
+            vectorstore=vectorstore,
+            bm25=bm25,
+            k=k,
+            fetch_k=max(k, int(cfg.get("fetch_k", 50))),
+            dense_weight=float(cfg.get("dense_weight", 0.5)),
+            lexical_weight=float(cfg.get("lexical_weight", 0.5)),
+        )
+
+    @staticmethod
+    def _scaled(hits: List[Tuple[int, float]]) -> Dict[int, float]:
+        if not hits:
+            return {}
+        lo, hi = min(s for _, s in hits), max(s for _, s in hits)
+        return {p: (s - lo) / (hi - lo) if hi > lo else 1.0 for p, s in hits}
+
+    def fused(self, query: str, embedding: List[float]) -> List[Tuple[Document, float]]:
+        """Top-k (document, fused score) pairs, best first; scores lie in [0, dense_weight + lexical_weight]."""
+        dense = self.vectorstore.search_positions(embedding, self.fetch_k)
+        if not self.vectorstore._higher_is_better():
+            dense = [(p, -d) for p, d in dense]  # L2 distance: smaller is closer
+        lexical = self.bm25.search(query, self.fetch_k) if self.bm25 is not None else []
+        fused: Dict[int, float] = {}
+        for weight, scaled in ((self.dense_weight, self._scaled(dense)),
+                               (self.lexical_weight, self._scaled(lexical))):
+            for position, score in scaled.items():
+                fused[position] = fused.get(position, 0.0) + weight * score
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[: self.k]
+        return [(self.vectorstore.document_at(position), score) for position, score in best]
+
+    def _fuse(self, query: str, embedding: List[float]) -> List[Document]:
+        return [d for d, _ in self.fused(query, embedding)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._fuse(query, self.vectorstore.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = await self.vectorstore.embeddings.aembed_query(query)
+        return await run_blocking(self._fuse, query, embedding)
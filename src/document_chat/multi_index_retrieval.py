@@ -0,0 +1,91 @@
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from logger.custom_logger import CustomLogger
+from src.document_chat.hybrid_retrieval import HybridRetriever
+from utils.concurrency import run_blocking
+from utils.segmented_index import SegmentedVectorStore
+
+log = CustomLogger().get_logger(__name__)
+
+# Separate from the blocking pool: retrieval already runs on that pool, and
+# waiting there for shard searches queued behind it could deadlock.
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", str(min(16, (os.cpu_count() or 1) + 4))))
+
+_executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_WORKERS, thread_name_prefix="shard-search")
+
+
+def shard_executor() -> ThreadPoolExecutor:
+    """Pool used for per-shard searches and loads."""
+    return _executor
+
+
+class MultiIndexRetriever(BaseRetriever):
+    """
+    Searches several session indexes in parallel and merges their top-k by score.
+
+    The query is embedded once and the same vector is searched in every shard,
+    so distances are comparable across shards (all indexes share the embedding
+    model). With `hybrid` (one HybridRetriever per shard) each shard fuses its
+    dense and BM25 candidates and the shards' top-k are merged by fused score
+    instead. Each returned document carries its shard name in
+    metadata["session_id"]; per-shard latency of the last search is in
+    `last_shard_ms`.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    shards: Dict[str, SegmentedVectorStore]
+    hybrid: Dict[str, HybridRetriever] = Field(default_factory=dict)
+    k: int = 5
+    _last_shard_ms: Dict[str, float] = PrivateAttr(default_factory=dict)
+
+    @property
+    def last_shard_ms(self) -> Dict[str, float]:
+        return dict(self._last_shard_ms)
+
+    def _search_shard(self, name: str, query: str,
+                      embedding: List[float]) -> Tuple[str, List[Tuple[Document, float]], float]:
+        start = time.perf_counter()
+        if name in self.hybrid:
+            hits = self.hybrid[name].fused(query, embedding)
+        else:
+            hits = self.shards[name].similarity_search_with_score_by_vector(embedding, self.k)
+        return name, hits, round((time.perf_counter() - start) * 1000, 2)
+
+    def _search(self, query: str, embedding: List[float]) -> List[Document]:
+        futures = [_executor.submit(self._search_shard, name, query, embedding) for name in self.shards]
+        merged: List[Tuple[Document, float]] = []
+        timings: Dict[str, float] = {}
+        for future in futures:
+            name, hits, ms = future.result()
+            timings[name] = ms
+            merged.extend(
+                (Document(page_content=d.page_content, metadata={**d.metadata, "session_id": name}, id=d.id), s)
+                for d, s in hits
+            )
+        higher_is_better = bool(self.hybrid) or next(iter(self.shards.values()))._higher_is_better()
+        merged.sort(key=lambda hit: hit[1], reverse=higher_is_better)
+        self._last_shard_ms = timings
+        log.info("Multi-index search complete", shards=len(timings), shard_ms=timings, k=self.k,
+                 hybrid=bool(self.hybrid))
+        return [d for d, _ in merged[: self.k]]
+
+    def _embeddings(self):
+        return next(iter(self.shards.values())).embeddings
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._search(query, self._embeddings().embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = await self._embeddings().aembed_query(query)
+        return await run_blocking(self._search, query, embedding)
@@ -1,14 +1,21 @@
 import sys
 import os
+import time
 from operator import itemgetter
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 
 from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import FAISS
+from langchain_core.runnables import RunnableBranch
 
 from utils.model_loader import ModelLoader
+from utils.vectorstore_cache import get_vectorstore_cache
+from utils.segmented_index import load_segmented
+from utils.bm25_index import BM25_FILE, BM25Index
+from utils.answer_cache import chunk_ids, get_answer_cache, index_scope
+from src.document_chat.hybrid_retrieval import HybridRetriever
+from src.document_chat.multi_index_retrieval import MultiIndexRetriever, shard_executor
 from exception.custom_exception import DocumentPortalException
 from logger.custom_logger import CustomLogger
 from prompt.prompt_library import PROMPT_REGISTRY
@@ -29,6 +36,7 @@ class ConversationalRAG:
         try:
             self.log = CustomLogger().get_logger(__name__)
             self.session_id = session_id
+            self.model_loader = ModelLoader()
 
             # Load LLM and prompts once
             self.llm = self._load_llm()
@@ -42,6 +50,9 @@ class ConversationalRAG:
             # Lazy pieces
             self.retriever = retriever
             self.chain = None
+            # answer-cache key parts; set when the retriever is loaded from FAISS
+            self._cache_scope = None
+            self._cache_version = ()
             if self.retriever is not None:
                 self._build_lcel_chain()
 
@@ -59,28 +70,40 @@ class ConversationalRAG:
         index_name: str = "index",
         search_type: str = "similarity",
         search_kwargs: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
     ):
         """
-        Load FAISS vectorstore from disk and build retriever + LCEL chain.
+        Load the FAISS base index + delta segments (via the process-wide cache) and build retriever + LCEL chain.
+        Plain similarity search is fused with the index's BM25 side when `hybrid`
+        (default: config.yaml `retriever.hybrid.enabled`) and the BM25 index is in sync.
         """
         try:
             if not os.path.isdir(index_path):
                 raise FileNotFoundError(f"FAISS index directory not found: {index_path}")
 
-            embeddings = ModelLoader().load_embeddings()
-            vectorstore = FAISS.load_local(
+            embeddings = self.model_loader.load_embeddings()
+            vectorstore = get_vectorstore_cache().get(
                 index_path,
-                embeddings,
+                lambda: load_segmented(index_path, embeddings, index_name=index_name),
                 index_name=index_name,
-                allow_dangerous_deserialization=True,  # ok if you trust the index
             )
 
-            if search_kwargs is None:
-                search_kwargs = {"k": k}
+            hybrid_cfg = (self.model_loader.config.get("retriever", {}) or {}).get("hybrid", {}) or {}
+            if hybrid is None:
+                hybrid = bool(hybrid_cfg.get("enabled", False))
+            bm25 = None
+            if hybrid and search_type == "similarity" and not search_kwargs:
+                bm25 = self._open_bm25(index_path, vectorstore, index_name)
 
-            self.retriever = vectorstore.as_retriever(
-                search_type=search_type, search_kwargs=search_kwargs
-            )
+            if bm25 is not None:
+                self.retriever = HybridRetriever.from_config(vectorstore, bm25, k, hybrid_cfg)
+            else:
+                if search_kwargs is None:
+                    search_kwargs = {"k": k}
+                self.retriever = vectorstore.as_retriever(
+                    search_type=search_type, search_kwargs=search_kwargs
+                )
+            self._cache_scope, self._cache_version = index_scope([index_path]), (vectorstore.ntotal,)
             self._build_lcel_chain()
 
             self.log.info(
@@ -88,6 +111,7 @@ class ConversationalRAG:
                 index_path=index_path,
                 index_name=index_name,
                 k=k,
+                hybrid=bm25 is not None,
                 session_id=self.session_id,
             )
             return self.retriever
@@ -96,6 +120,73 @@ class ConversationalRAG:
             self.log.error("Failed to load retriever from FAISS", error=str(e))
             raise DocumentPortalException("Loading error in ConversationalRAG", sys)
 
+    def load_retriever_from_faiss_multi(self, index_paths: Dict[str, str], k: int = 5, index_name: str = "index",
+                                        hybrid: Optional[bool] = None):
+        """
+        Load several session indexes (name -> directory) and build a retriever that
+        searches them in parallel and merges the top-k by score. With `hybrid`
+        (default: config.yaml `retriever.hybrid.enabled`) every index is searched
+        through its own HybridRetriever and the fused results are merged.
+        """
+        try:
+            if not index_paths:
+                raise ValueError("No index paths given")
+            missing = [p for p in index_paths.values() if not os.path.isdir(p)]
+            if missing:
+                raise FileNotFoundError(f"FAISS index directory not found: {', '.join(missing)}")
+
+            embeddings = self.model_loader.load_embeddings()
+            cache = get_vectorstore_cache()
+
+            def load(path: str):
+                return cache.get(path, lambda: load_segmented(path, embeddings, index_name=index_name),
+                                 index_name=index_name)
+
+            loaded = list(shard_executor().map(load, index_paths.values()))
+            hybrid_cfg = (self.model_loader.config.get("retriever", {}) or {}).get("hybrid", {}) or {}
+            if hybrid is None:
+                hybrid = bool(hybrid_cfg.get("enabled", False))
+            hybrids = {}
+            if hybrid:
+                # every shard is fused, with or without its BM25 side, so scores merge on one scale
+                hybrids = {
+                    name: HybridRetriever.from_config(vs, self._open_bm25(path, vs, index_name), k, hybrid_cfg)
+                    for (name, path), vs in zip(index_paths.items(), loaded)
+                }
+            self.retriever = MultiIndexRetriever(shards=dict(zip(index_paths, loaded)), hybrid=hybrids, k=k)
+            # scope is sorted by path, so the version is ordered the same way
+            by_path = sorted(zip(index_paths.values(), loaded), key=lambda pv: os.path.abspath(pv[0]))
+            self._cache_scope = index_scope(index_paths.values())
+            self._cache_version = tuple(vs.ntotal for _, vs in by_path)
+            self._build_lcel_chain()
+
+            self.log.info(
+                "Multi-index retriever loaded successfully",
+                shards=list(index_paths),
+                index_name=index_name,
+                k=k,
+                hybrid=sum(h.bm25 is not None for h in hybrids.values()),
+                session_id=self.session_id,
+            )
+            return self.retriever
+
+        except Exception as e:
+            self.log.error("Failed to load multi-index retriever", error=str(e))
+            raise DocumentPortalException("Loading error in ConversationalRAG", e) from e
+
+    def _open_bm25(self, index_path: str, vectorstore, index_name: str = "index") -> Optional[BM25Index]:
+        path = os.path.join(index_path, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        # one connection per loaded index, dropped with its vectorstore cache entry
+        bm25 = get_vectorstore_cache().attachment(index_path, "bm25", lambda: BM25Index(path),
+                                                  index_name=index_name)
+        if bm25.doc_count() != vectorstore.ntotal:
+            # rebuilt on the next ingest into this index
+            self.log.warning("BM25 index out of sync; using vector search only", index_path=index_path)
+            return None
+        return bm25
+
     def invoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
         """Invoke the LCEL pipeline."""
         try:
@@ -105,7 +196,7 @@ class ConversationalRAG:
                 )
             chat_history = chat_history or []
             payload = {"input": user_input, "chat_history": chat_history}
-            answer = self.chain.invoke(payload)
+            answer = self._answer(payload)
             if not answer:
                 self.log.warning(
                     "No answer generated", user_input=user_input, session_id=self.session_id
@@ -122,11 +213,169 @@ class ConversationalRAG:
             self.log.error("Failed to invoke ConversationalRAG", error=str(e))
             raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
 
+    async def ainvoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
+        """Async variant of invoke (LLM + retrieval via ainvoke)."""
+        try:
+            if self.chain is None:
+                raise DocumentPortalException(
+                    "RAG chain not initialized. Call load_retriever_from_faiss() before ainvoke().", sys
+                )
+            chat_history = chat_history or []
+            payload = {"input": user_input, "chat_history": chat_history}
+            answer = await self._aanswer(payload)
+            if not answer:
+                self.log.warning(
+                    "No answer generated", user_input=user_input, session_id=self.session_id
+                )
+                return "no answer generated."
+            self.log.info(
+                "Chain invoked successfully",
+                session_id=self.session_id,
+                user_input=user_input,
+                answer_preview=str(answer)[:150],
+            )
+            return answer
+        except Exception as e:
+            self.log.error("Failed to invoke ConversationalRAG", error=str(e))
+            raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
+
+    async def astream(
+        self, user_input: str, chat_history: Optional[List[BaseMessage]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the LCEL pipeline as events: one "retrieval" event (rewrite/retrieval
+        timing + sources) before the answer, then "token" events, then "done".
+        """
+        try:
+            if self.chain is None:
+                raise DocumentPortalException(
+                    "RAG chain not initialized. Call load_retriever_from_faiss() before astream().", sys
+                )
+            chat_history = chat_history or []
+            payload = {"input": user_input, "chat_history": chat_history}
+            start = time.perf_counter()
+
+            rewritten = await self.question_rewriter.ainvoke(payload)
+            rewrite_ms = (time.perf_counter() - start) * 1000
+            docs = await self.retriever.ainvoke(rewritten)
+            retrieval_ms = (time.perf_counter() - start) * 1000 - rewrite_ms
+            yield {
+                "event": "retrieval",
+                "data": {
+                    "rewritten_question": rewritten,
+                    "rewrite_ms": round(rewrite_ms, 2),
+                    "retrieval_ms": round(retrieval_ms, 2),
+                    "sources": [self._source_of(d) for d in docs],
+                    **self.shard_timings(),
+                },
+            }
+
+            first_token_ms = None
+            chunks = []
+            async for token in self.answer_chain.astream({"context": self._format_docs(docs), **payload}):
+                if not token:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                chunks.append(token)
+                yield {"event": "token", "data": token}
+
+            total_ms = (time.perf_counter() - start) * 1000
+            self.log.info(
+                "Chain streamed successfully",
+                session_id=self.session_id,
+                user_input=user_input,
+                first_token_ms=round(first_token_ms or total_ms, 2),
+                total_ms=round(total_ms, 2),
+                answer_preview="".join(chunks)[:150],
+            )
+            yield {
+                "event": "done",
+                "data": {
+                    "first_token_ms": round(first_token_ms or total_ms, 2),
+                    "total_ms": round(total_ms, 2),
+                },
+            }
+        except Exception as e:
+            self.log.error("Failed to stream ConversationalRAG", error=str(e))
+            raise DocumentPortalException("Streaming error in ConversationalRAG", e) from e
+
     # ---------- Internals ----------
 
+    def _cache_for(self, payload: Dict[str, Any]):
+        """
+        The answer cache, and whether this is a first turn eligible for pre-retrieval lookup.
+        Turns with chat history skip the cache: their answers depend on the conversation,
+        which the cache key does not cover.
+        """
+        if self._cache_scope is None or payload["chat_history"]:
+            return None, False, False
+        cache = get_answer_cache()
+        first_turn = cache is not None
+        return cache, first_turn and cache.similarity_threshold is not None, first_turn
+
+    def _answer(self, payload: Dict[str, Any]) -> str:
+        """Rewrite -> retrieve -> answer, consulting the answer cache before each LLM call."""
+        cache, semantic, first_turn = self._cache_for(payload)
+        embedding = None
+        if first_turn:
+            if semantic:
+                embedding = self.model_loader.load_embeddings().embed_query(payload["input"])
+            hit = cache.lookup(self._cache_scope, self._cache_version, payload["input"], embedding)
+            if hit is not None:
+                return hit
+        rewritten = self.question_rewriter.invoke(payload)
+        docs = self.retriever.invoke(rewritten)
+        if cache is not None:
+            chunks = chunk_ids(docs)
+            hit = cache.get(self._cache_scope, self._cache_version, rewritten, chunks)
+            if hit is not None:
+                return hit
+        answer = self.answer_chain.invoke({"context": self._format_docs(docs), **payload})
+        if cache is not None and answer:
+            cache.put(self._cache_scope, self._cache_version, rewritten, chunks, answer,
+                      alias=payload["input"] if first_turn else None, embedding=embedding)
+        return answer
+
+    async def _aanswer(self, payload: Dict[str, Any]) -> str:
+        cache, semantic, first_turn = self._cache_for(payload)
+        embedding = None
+        if first_turn:
+            if semantic:
+                embedding = await self.model_loader.load_embeddings().aembed_query(payload["input"])
+            hit = cache.lookup(self._cache_scope, self._cache_version, payload["input"], embedding)
+            if hit is not None:
+                return hit
+        rewritten = await self.question_rewriter.ainvoke(payload)
+        docs = await self.retriever.ainvoke(rewritten)
+        if cache is not None:
+            chunks = chunk_ids(docs)
+            hit = cache.get(self._cache_scope, self._cache_version, rewritten, chunks)
+            if hit is not None:
+                return hit
+        answer = await self.answer_chain.ainvoke({"context": self._format_docs(docs), **payload})
+        if cache is not None and answer:
+            cache.put(self._cache_scope, self._cache_version, rewritten, chunks, answer,
+                      alias=payload["input"] if first_turn else None, embedding=embedding)
+        return answer
+
+    @staticmethod
+    def _source_of(doc) -> Dict[str, Any]:
+        md = getattr(doc, "metadata", {}) or {}
+        source = {"source": md.get("source") or md.get("file_path"), "page": md.get("page")}
+        if "session_id" in md:
+            source["session_id"] = md["session_id"]
+        return source
+
+    def shard_timings(self) -> Dict[str, Any]:
+        """Per-shard latency of the last multi-index search, if that is the retriever in use."""
+        if isinstance(self.retriever, MultiIndexRetriever):
+            return {"shard_ms": self.retriever.last_shard_ms}
+        return {}
+
     def _load_llm(self):
         try:
-            llm = ModelLoader().load_llm()
+            llm = self.model_loader.load_llm()
             if not llm:
                 raise ValueError("LLM could not be loaded")
             self.log.info("LLM loaded successfully", session_id=self.session_id)
@@ -144,27 +393,28 @@ class ConversationalRAG:
             if self.retriever is None:
                 raise DocumentPortalException("No retriever set before building chain", sys)
 
-            # 1) Rewrite user question with chat history context
-            question_rewriter = (
+            # 1) Rewrite user question with chat history context; a first turn has
+            #    nothing to resolve, so it skips the LLM round trip
+            self.question_rewriter = RunnableBranch(
+                (lambda x: not x["chat_history"], itemgetter("input")),
                 {"input": itemgetter("input"), "chat_history": itemgetter("chat_history")}
                 | self.contextualize_prompt
                 | self.llm
-                | StrOutputParser()
+                | StrOutputParser(),
             )
 
             # 2) Retrieve docs for rewritten question
-            retrieve_docs = question_rewriter | self.retriever | self._format_docs
+            self.retrieve_chain = self.question_rewriter | self.retriever
 
             # 3) Answer using retrieved context + original input + chat history
+            self.answer_chain = self.qa_prompt | self.llm | StrOutputParser()
             self.chain = (
                 {
-                    "context": retrieve_docs,
+                    "context": self.retrieve_chain | self._format_docs,
                     "input": itemgetter("input"),
                     "chat_history": itemgetter("chat_history"),
                 }
-                | self.qa_prompt
-                | self.llm
-                | StrOutputParser()
+                | self.answer_chain
             )
 
             self.log.info("LCEL graph built successfully", session_id=self.session_id)
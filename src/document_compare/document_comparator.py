@@ -1,17 +1,22 @@
 import sys
-from dotenv import load_dotenv
+from typing import Any, Dict, List
 import pandas as pd
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain.output_parsers import OutputFixingParser
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 from prompt.prompt_library import PROMPT_REGISTRY
-from model.models import SummaryResponse,PromptType
+from model.models import ChangeFormat, SummaryResponse,PromptType
+from src.document_compare.page_diff import ADDED, CHANGED, EQUAL, PageDiff, align_pages, line_diff
+from utils.result_cache import model_id, prompt_version
+
+DEFAULT_MAX_CONCURRENCY = 8
+PAGE_DIFF_VERSION = 3  # bump when alignment or row assembly changes, to retire cached results
+_PREVIEW_CHARS = 200
 
 class DocumentComparatorLLM:
     def __init__(self):
-        load_dotenv()
         self.log = CustomLogger().get_logger(__name__)
         self.loader = ModelLoader()
         self.llm = self.loader.load_llm()
@@ -19,6 +24,9 @@ class DocumentComparatorLLM:
         self.fixing_parser = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
         self.prompt = PROMPT_REGISTRY[PromptType.DOCUMENT_COMPARISON.value]
         self.chain = self.prompt | self.llm | self.parser
+        self.page_chain = PROMPT_REGISTRY[PromptType.PAGE_COMPARISON.value] | self.llm | StrOutputParser()
+        cfg = self.loader.config.get("compare", {}) or {}
+        self.max_concurrency = int(cfg.get("max_concurrency", DEFAULT_MAX_CONCURRENCY))
         self.log.info("DocumentComparatorLLM initialized", model=self.llm)
 
     def compare_documents(self, combined_docs: str) -> pd.DataFrame:
@@ -36,10 +44,97 @@ class DocumentComparatorLLM:
             self.log.error("Error in compare_documents", error=str(e))
             raise DocumentPortalException("Error comparing documents", sys)
 
+    async def acompare_documents(self, combined_docs: str) -> pd.DataFrame:
+        try:
+            inputs = {
+                "combined_docs": combined_docs,
+                "format_instruction": self.parser.get_format_instructions()
+            }
+
+            self.log.info("Invoking document comparison LLM chain (async)")
+            response = await self.chain.ainvoke(inputs)
+            self.log.info("Chain invoked successfully", response_preview=str(response)[:200])
+            return self._format_response(response)
+        except Exception as e:
+            self.log.error("Error in acompare_documents", error=str(e))
+            raise DocumentPortalException("Error comparing documents", sys)
+
+    # ---------- Page-level comparison ----------
+
+    def result_key(self, ref_sha256: str, act_sha256: str) -> Dict[str, Any]:
+        """Cache key for compare_pages() on these two files with the current model and prompt."""
+        return {
+            "reference": ref_sha256,
+            "actual": act_sha256,
+            "prompt": prompt_version(PROMPT_REGISTRY[PromptType.PAGE_COMPARISON.value]),
+            "pipeline": PAGE_DIFF_VERSION,
+            "model": model_id(self.llm),
+        }
+
+    def compare_pages(self, ref_pages: List[str], act_pages: List[str]) -> pd.DataFrame:
+        """
+        Diff locally, then ask the LLM only about changed page pairs (concurrently).
+        Identical pages become NO CHANGE rows; added/removed pages are described locally.
+        """
+        try:
+            diffs = align_pages(ref_pages, act_pages)
+            changed = [d for d in diffs if d.kind == CHANGED]
+            self._log_diff(diffs, changed)
+            answers = self.page_chain.batch(
+                [self._page_input(d) for d in changed], config={"max_concurrency": self.max_concurrency}
+            ) if changed else []
+            return self._format_response(self._page_rows(diffs, answers))
+        except Exception as e:
+            self.log.error("Error in compare_pages", error=str(e))
+            raise DocumentPortalException("Error comparing documents", e) from e
+
+    async def acompare_pages(self, ref_pages: List[str], act_pages: List[str]) -> pd.DataFrame:
+        try:
+            diffs = align_pages(ref_pages, act_pages)
+            changed = [d for d in diffs if d.kind == CHANGED]
+            self._log_diff(diffs, changed)
+            answers = await self.page_chain.abatch(
+                [self._page_input(d) for d in changed], config={"max_concurrency": self.max_concurrency}
+            ) if changed else []
+            return self._format_response(self._page_rows(diffs, answers))
+        except Exception as e:
+            self.log.error("Error in acompare_pages", error=str(e))
+            raise DocumentPortalException("Error comparing documents", e) from e
+
+    def _log_diff(self, diffs: List[PageDiff], changed: List[PageDiff]):
+        self.log.info("Page diff computed", pages=len(diffs), changed=len(changed),
+                      unchanged=sum(d.kind == EQUAL for d in diffs))
+
+    @staticmethod
+    def _page_input(diff: PageDiff) -> Dict[str, Any]:
+        return {"ref_page": diff.ref_page, "act_page": diff.act_page,
+                "diff": line_diff(diff.ref_text, diff.act_text, context=2)}
+
+    @staticmethod
+    def _preview(text: str) -> str:
+        text = " ".join(text.split())
+        return text[:_PREVIEW_CHARS] + ("..." if len(text) > _PREVIEW_CHARS else "")
+
+    def _page_rows(self, diffs: List[PageDiff], answers: List[str]) -> List[Dict[str, str]]:
+        """ChangeFormat rows in document order; LLM answers fill the changed pages in turn."""
+        answers_iter = iter(answers)
+        rows = []
+        for d in diffs:
+            if d.kind == EQUAL:
+                changes = "NO CHANGE"
+            elif d.kind == CHANGED:
+                changes = next(answers_iter).strip()
+            elif d.kind == ADDED:
+                changes = f"Page added: {self._preview(d.act_text)}"
+            else:
+                changes = f"Page removed: {self._preview(d.ref_text)}"
+            rows.append(ChangeFormat(Page=d.label, Changes=changes).model_dump())
+        return rows
+
     def _format_response(self, response_parsed: list[dict]) -> pd.DataFrame: #type: ignore
         try:
             df = pd.DataFrame(response_parsed)
             return df
         except Exception as e:
             self.log.error("Error formatting response into DataFrame", error=str(e))
-            DocumentPortalException("Error formatting response", sys)
\ No newline at end of file
+            DocumentPortalException("Error formatting response", sys)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import difflib
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+EQUAL = "equal"
+CHANGED = "changed"
+ADDED = "added"
+REMOVED = "removed"
+
+PAIR_SIMILARITY = 0.5      # pages of an uneven replaced run less alike than this are added/removed, not changed
+MAX_PAIRING_CELLS = 400    # page pairs compared per replaced run before falling back to positional pairing
+
+_SPACE_RE = re.compile(r"\s+")
+_DIGIT_RE = re.compile(r"\d")
+
+
+def page_hash(text: str) -> str:
+    """Digest of a page's text with whitespace collapsed, so reflowed but identical pages match."""
+    return hashlib.sha256(_SPACE_RE.sub(" ", text).strip().encode("utf-8")).hexdigest()
+
+
+@dataclass
+class PageDiff:
+    kind: str                  # equal | changed | added | removed
+    ref_page: Optional[int]    # 1-based page number in the reference document
+    act_page: Optional[int]    # 1-based page number in the actual document
+    ref_text: str = ""
+    act_text: str = ""
+
+    @property
+    def label(self) -> str:
+        if self.kind == ADDED:
+            return f"{self.act_page} (added)"
+        if self.kind == REMOVED:
+            return f"{self.ref_page} (removed)"
+        if self.ref_page == self.act_page:
+            return str(self.act_page)
+        return f"{self.ref_page} -> {self.act_page}"
+
+
+def align_pages(ref_pages: List[str], act_pages: List[str]) -> List[PageDiff]:
+    """
+    Align two documents page by page on content hashes (difflib's longest-matching-
+    block alignment), so an inserted or removed page shifts the pairing instead of
+    making every later page look changed. Within a replaced run, pages are paired
+    by content similarity (see _pair_replaced); the rest are reported as added or
+    removed.
+    """
+    ref_hashes = [page_hash(p) for p in ref_pages]
+    act_hashes = [page_hash(p) for p in act_pages]
+    matcher = difflib.SequenceMatcher(None, ref_hashes, act_hashes, autojunk=False)
+    diffs: List[PageDiff] = []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            diffs.extend(PageDiff(EQUAL, i + 1, j + 1) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+        for i, j in _pair_replaced(ref_pages, act_pages, i1, i2, j1, j2):
+            if j is None:
+                diffs.append(PageDiff(REMOVED, i + 1, None, ref_text=ref_pages[i]))
+            elif i is None:
+                diffs.append(PageDiff(ADDED, None, j + 1, act_text=act_pages[j]))
+            else:
+                diffs.append(PageDiff(CHANGED, i + 1, j + 1, ref_pages[i], act_pages[j]))
+    return diffs
+
+
+def page_similarity(ref_text: str, act_text: str) -> float:
+    """
+    Similarity of two pages' words (difflib ratio) with every digit masked, so a
+    page edited in place, even with all of its figures changed, still scores high.
+    Returns 0.0 early when the cheap upper bounds are already below PAIR_SIMILARITY.
+    """
+    matcher = difflib.SequenceMatcher(None, _page_words(ref_text), _page_words(act_text), autojunk=False)
+    if matcher.real_quick_ratio() < PAIR_SIMILARITY or matcher.quick_ratio() < PAIR_SIMILARITY:
+        return 0.0
+    return matcher.ratio()
+
+
+def _page_words(text: str) -> List[str]:
+    return _DIGIT_RE.sub("0", text).split()
+
+
+def _pair_replaced(ref_pages: List[str], act_pages: List[str], i1: int, i2: int, j1: int, j2: int,
+                   ) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Pages of a replaced run in document order, as (ref index, act index) pairs with
+    None for an unpaired side. Runs with as many pages on both sides (pages edited
+    in place) are paired by position. Otherwise pairs keep document order and
+    maximize total similarity, and only pages at least PAIR_SIMILARITY alike are
+    paired, so an edited page is not compared against an unrelated inserted one.
+    Runs larger than MAX_PAIRING_CELLS page pairs fall back to positional pairing.
+    """
+    n, m = i2 - i1, j2 - j1
+    if n == m or n * m > MAX_PAIRING_CELLS:
+        paired = min(n, m)
+        return ([(i1 + k, j1 + k) for k in range(paired)] + [(i, None) for i in range(i1 + paired, i2)]
+                + [(None, j) for j in range(j1 + paired, j2)])
+    sim = [[page_similarity(ref_pages[i1 + a], act_pages[j1 + b]) for b in range(m)] for a in range(n)]
+    # best[a][b]: highest total similarity aligning the first a ref and first b act pages
+    best = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for a in range(1, n + 1):
+        for b in range(1, m + 1):
+            best[a][b] = max(best[a - 1][b], best[a][b - 1])
+            if sim[a - 1][b - 1] >= PAIR_SIMILARITY:
+                best[a][b] = max(best[a][b], best[a - 1][b - 1] + sim[a - 1][b - 1])
+    pairs: List[Tuple[Optional[int], Optional[int]]] = []
+    a, b = n, m
+    while a or b:
+        diagonal = a and b and sim[a - 1][b - 1] >= PAIR_SIMILARITY
+        if diagonal and best[a][b] == best[a - 1][b - 1] + sim[a - 1][b - 1]:
+            a, b = a - 1, b - 1
+            pairs.append((i1 + a, j1 + b))
+        elif b and (not a or best[a][b] == best[a][b - 1]):
+            b -= 1
+            pairs.append((None, j1 + b))
+        else:
+            a -= 1
+            pairs.append((i1 + a, None))
+    pairs.reverse()
+    return pairs
+
+
+def line_diff(ref_text: str, act_text: str, context: int = 1) -> str:
+    """Unified diff of two pages' lines; this is all the LLM is shown of a changed page pair."""
+    return "\n".join(difflib.unified_diff(
+        ref_text.splitlines(), act_text.splitlines(), "reference", "actual", n=context, lineterm="",
+    ))
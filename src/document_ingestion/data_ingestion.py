@@ -1,96 +1,257 @@
 from __future__ import annotations
 import os
 import sys
-import json
 import uuid
 import hashlib
 import shutil
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Iterable, List, Optional, Dict, Any
+from typing import Callable, Iterable, List, Optional, Dict, Any
 
-import fitz  # PyMuPDF
+import faiss
+import numpy as np
 from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 
-from utils.file_io import _session_id, save_uploaded_files
+from utils.file_io import _session_id, save_uploaded_files, stream_upload_to_file, SavedUpload
+from utils.timing import StageTimer
+from utils.concurrency import run_blocking
+from utils.extraction_cache import get_extraction_cache
+from utils.fingerprint_store import FingerprintStore
+from utils.segmented_index import (
+    DEFAULT_MAX_SEGMENTS, SegmentedVectorStore, append_segment, dir_lock, get_segment_compactor,
+    index_version, load_segmented, part_exists, segment_template, write_base,
+)
+from utils.index_types import build_index, finalize_index, index_spec
+from utils.compact_docstore import faiss_rows
+from utils.bm25_index import BM25_FILE, BM25Index
+from utils.answer_cache import get_answer_cache
+from utils.text_splitter import get_text_splitter
+from utils.tokens import chars_to_tokens, tokenizer_name
 from utils.document_ops import load_documents, concat_for_analysis, concat_for_comparison
 
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 
 # FAISS Manager (load-or-create)
 class FaissManager:
-    def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader] = None):
+    def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader] = None, index_profile: str = "session"):
+        self.log = CustomLogger().get_logger(__name__)
         self.index_dir = Path(index_dir)
+        self.index_profile = index_profile  # selects faiss_db.index.<profile> in config.yaml
         self.index_dir.mkdir(parents=True, exist_ok=True)
         
-        self.meta_path = self.index_dir / "ingested_meta.json"
-        self._meta: Dict[str, Any] = {"rows": {}}
-        
-        if self.meta_path.exists():
-            try:
-                self._meta = json.loads(self.meta_path.read_text(encoding="utf-8")) or {"rows": {}}
-            except Exception:
-                self._meta = {"rows": {}}
+        # chunk fingerprints already in the index; a legacy ingested_meta.json is
+        # replaced by fingerprints rebuilt from the index on first load
+        self.fingerprints = FingerprintStore(self.index_dir / "fingerprints.sqlite3")
+        self.legacy_meta = self.index_dir / "ingested_meta.json"
+        # lexical side of hybrid retrieval, kept in step with the vectors
+        self.bm25 = BM25Index(self.index_dir / BM25_FILE)
         
 
         self.model_loader = model_loader or ModelLoader()
         self.emb = self.model_loader.load_embeddings()
-        self.vs: Optional[FAISS] = None
+        self.vs: Optional[SegmentedVectorStore] = None
+        self.last_timings: Dict[str, float] = {}
         
     def _exists(self)-> bool:
-        return (self.index_dir / "index.faiss").exists() and (self.index_dir / "index.pkl").exists()
+        return part_exists(self.index_dir, "index")
     
     @staticmethod
     def _fingerprint(text: str, md: Dict[str, Any]) -> str:
         src = md.get("source") or md.get("file_path")
         rid = md.get("row_id")
-        if src is not None:
-            return f"{src}::{'' if rid is None else rid}"
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if src is not None and rid is not None:
+            return f"{src}::{rid}"
+        # chunks carry no row_id: key on content so sibling chunks of one file stay distinct
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return digest if src is None else f"{src}::{digest}"
     
-    def _save_meta(self):
-        self.meta_path.write_text(json.dumps(self._meta, ensure_ascii=False, indent=2), encoding="utf-8")
         
-        
-    def add_documents(self,docs: List[Document]):
+    def _prepare(self, docs: List[Document], timer: StageTimer):
+        """Load the existing index (if any) and keep only chunks not yet fingerprinted."""
         if self.vs is None:
-            raise RuntimeError("Call load_or_create() before add_documents_idempotent().")
-        
+            with dir_lock(self.index_dir):
+                if self._exists():
+                    with timer.stage("load_index"):
+                        self.load_or_create()
+                    if self.bm25.doc_count() != self.vs.ntotal:
+                        with timer.stage("lexical_backfill"):
+                            self._rebuild_bm25()
+                    if self.legacy_meta.exists():
+                        with timer.stage("fingerprint_migration"):
+                            self._rebuild_fingerprints()
+                else:
+                    self.fingerprints.clear()  # fingerprints without an index are stale
+                    self.bm25.clear()
+                    self._retire_legacy_meta()
+
         new_docs: List[Document] = []
-        
-        for d in docs:
-            key = self._fingerprint(d.page_content, d.metadata or {})
-            if key in self._meta["rows"]:
-                continue
-            self._meta["rows"][key] = True
-            new_docs.append(d)
-            
+        keys: List[str] = []
+        with timer.stage("dedupe"):
+            all_keys = [self._fingerprint(d.page_content, d.metadata or {}) for d in docs]
+            seen = self.fingerprints.contains_many(set(all_keys))
+            for d, key in zip(docs, all_keys):
+                if key in seen:
+                    continue
+                seen.add(key)
+                keys.append(key)
+                new_docs.append(d)
+        return new_docs, keys
+
+    def _commit(self, new_docs: List[Document], keys: List[str], vectors: List[List[float]],
+                timer: StageTimer) -> int:
+        """
+        Index the new vectors on their own and persist them: as the base index on
+        first ingest, otherwise as a delta segment, so the write is proportional to
+        the change. Segments are merged into the base in the background.
+
+        Runs under the directory lock: another ingest may have written this index
+        since _prepare (embedding happens unlocked), so the index is reloaded if it
+        moved on and fingerprints are re-checked before the write. Returns the
+        number of chunks added.
+        """
+        with dir_lock(self.index_dir):
+            self._refresh()
+            present = self.fingerprints.contains_many(set(keys))
+            if present:
+                rows = [(d, k, v) for d, k, v in zip(new_docs, keys, vectors) if k not in present]
+                new_docs, keys, vectors = (list(c) for c in zip(*rows)) if rows else ([], [], [])
+                self.log.info("Chunks indexed concurrently skipped", index_dir=str(self.index_dir),
+                              skipped=len(present))
+            if new_docs:
+                self._write(new_docs, keys, vectors, timer)
+            return len(new_docs)
+
+    def _refresh(self):
+        """Pick up a base or segments written by another ingest after this manager loaded the index."""
+        if self.vs is None:
+            if self._exists():
+                self.vs = load_segmented(self.index_dir, self.emb)
+        elif index_version(self.index_dir) != self.vs.version:
+            self.vs = load_segmented(self.index_dir, self.emb)
+
+    def _write(self, new_docs: List[Document], keys: List[str], vectors: List[List[float]], timer: StageTimer):
+        texts = [d.page_content for d in new_docs]
+        metas = [d.metadata or {} for d in new_docs]
+        with timer.stage("index"):
+            if self.vs is None:
+                # first batch: build (and train) the configured index type
+                spec = index_spec(self.model_loader.config, self.index_profile)
+                index, factory = build_index(spec, np.asarray(vectors, dtype=np.float32))
+                template = faiss.clone_index(index)
+            else:
+                index = segment_template(self.index_dir, len(vectors[0]))
+            fresh = FAISS(self.emb, index, InMemoryDocstore(), {})
+            fresh.add_embeddings(list(zip(texts, vectors)), metadatas=metas)
+            finalize_index(fresh.index)
+        with timer.stage("persist"):
+            if self.vs is None:
+                start = 0
+                write_base(self.index_dir, fresh, template=template, spec=spec, factory=factory)
+                self.vs = SegmentedVectorStore([fresh], self.emb, version=index_version(self.index_dir), spec=spec)
+            else:
+                start = self.vs.ntotal
+                manifest = append_segment(self.index_dir, fresh)
+                self.vs.add_part(fresh, version=manifest["version"])
+                if len(manifest["segments"]) >= self._max_segments():
+                    get_segment_compactor().schedule(self.index_dir, self.emb)
+        with timer.stage("lexical"):
+            self.bm25.add(start, texts)
+        with timer.stage("persist"):
+            self.fingerprints.add_many(keys)
+        answers = get_answer_cache()
+        if answers is not None:
+            answers.invalidate(str(self.index_dir))
+
+    def _rebuild_bm25(self):
+        # indexes written before BM25 existed, or an interrupted ingest
+        self.bm25.clear()
+        texts = (text for part in self.vs.parts for text, _ in faiss_rows(part))
+        added = self.bm25.add(0, texts)
+        self.log.info("BM25 index rebuilt", index_dir=str(self.index_dir), docs=added)
+
+    def _rebuild_fingerprints(self):
+        # legacy JSON keys were "<source>::" for every chunk of a file, so they cannot
+        # be converted; the index holds each chunk's text and metadata instead
+        self.fingerprints.clear()
+        keys = {self._fingerprint(text, md or {}) for part in self.vs.parts for text, md in faiss_rows(part)}
+        self.fingerprints.add_many(keys)
+        self._retire_legacy_meta()
+        self.log.info("Fingerprints rebuilt from index", index_dir=str(self.index_dir), keys=len(keys))
+
+    def _retire_legacy_meta(self):
+        if self.legacy_meta.exists():
+            self.legacy_meta.replace(self.legacy_meta.with_name(self.legacy_meta.name + ".migrated"))
+
+    def _max_segments(self) -> int:
+        cfg = self.model_loader.config.get("faiss_db", {}) or {}
+        return max(1, int(cfg.get("max_segments", DEFAULT_MAX_SEGMENTS)))
+
+    def _progress_window(self) -> int:
+        # enough texts per call to keep every scheduler slot busy between progress updates
+        cfg = self.model_loader.config.get("embedding_scheduler", {}) or {}
+        return max(1, int(cfg.get("batch_size", 100)) * int(cfg.get("max_concurrency", 4)))
+
+    def add_documents(self,docs: List[Document], progress: Optional[Callable[..., None]] = None):
+        """
+        Single-pass ingest: skip already-fingerprinted chunks, embed the rest once,
+        index those vectors as a new segment, then persist segment + fingerprints.
+        Per-stage timings (ms) are left in self.last_timings; `progress(stage=..., **counters)`
+        is called as chunks are embedded and vectors written.
+        """
+        timer = StageTimer()
+        new_docs, keys = self._prepare(docs, timer)
         if new_docs:
-            self.vs.add_documents(new_docs)
-            self.vs.save_local(str(self.index_dir))
-            self._save_meta()
-        return len(new_docs)
+            texts = [d.page_content for d in new_docs]
+            if progress:
+                progress(stage="embedding", chunks_new=len(new_docs))
+            with timer.stage("embed"):
+                if progress is None:
+                    vectors = self.emb.embed_documents(texts)
+                else:
+                    vectors = []
+                    window = self._progress_window()
+                    for i in range(0, len(texts), window):
+                        vectors.extend(self.emb.embed_documents(texts[i:i + window]))
+                        progress(chunks_embedded=len(vectors))
+            if progress:
+                progress(stage="writing")
+            added = self._commit(new_docs, keys, vectors, timer)
+            if progress:
+                progress(vectors_written=added)
+        else:
+            added = 0
+        self.last_timings = timer.timings
+        return added
+
+    async def aadd_documents(self, docs: List[Document]):
+        """Async add_documents: embeddings via aembed_documents, disk/index work on the blocking pool."""
+        timer = StageTimer()
+        new_docs, keys = await run_blocking(self._prepare, docs, timer)
+        if new_docs:
+            with timer.stage("embed"):
+                vectors = await self.emb.aembed_documents([d.page_content for d in new_docs])
+            added = await run_blocking(self._commit, new_docs, keys, vectors, timer)
+        else:
+            added = 0
+        self.last_timings = timer.timings
+        return added
     
     def load_or_create(self,texts:Optional[List[str]]=None, metadatas: Optional[List[dict]] = None):
         if self._exists():
-            self.vs = FAISS.load_local(
-                str(self.index_dir),
-                embeddings=self.emb,
-                allow_dangerous_deserialization=True,
-            )
+            self.vs = load_segmented(self.index_dir, self.emb)
             return self.vs
         if not texts:
             raise DocumentPortalException("No existing FAISS index and no data to create one", sys)
         
-        self.vs = FAISS.from_texts(texts=texts, embedding=self.emb, metadatas=metadatas or [])
-        self.vs.save_local(str(self.index_dir))
+        metadatas = metadatas or [{} for _ in texts]
+        self.add_documents([Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)])
         return self.vs
         
         
@@ -107,6 +268,7 @@ class ChatIngestor:
             
             self.use_session = use_session_dirs
             self.session_id = session_id or _session_id()
+            self.last_timings: Dict[str, float] = {}
             
             self.temp_base = Path(temp_base); self.temp_base.mkdir(parents=True, exist_ok=True)
             self.faiss_base = Path(faiss_base); self.faiss_base.mkdir(parents=True, exist_ok=True)
@@ -131,12 +293,49 @@ class ChatIngestor:
             return d
         return base
         
-    def _split(self, docs: List[Document], chunk_size=1000, chunk_overlap=200) -> List[Document]:
-        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    def _faiss_manager(self) -> FaissManager:
+        """FaissManager for this ingestor's index; shared by the sync and async pipelines."""
+        return FaissManager(self.faiss_dir, self.model_loader,
+                            index_profile="session" if self.use_session else "shared")
+
+    def _split(self, docs: Iterable[Document], chunk_size=1000, chunk_overlap=200) -> List[Document]:
+        """Chunk pages within a token budget; chunk_size/chunk_overlap are characters, at ~4 per token."""
+        splitter = get_text_splitter(chars_to_tokens(chunk_size), chars_to_tokens(chunk_overlap))
         chunks = splitter.split_documents(docs)
-        self.log.info("Documents split", chunks=len(chunks), chunk_size=chunk_size, overlap=chunk_overlap)
+        self.log.info("Documents split", chunks=len(chunks), chunk_tokens=splitter.chunk_tokens,
+                      overlap_tokens=splitter.overlap_tokens, tokenizer=tokenizer_name())
         return chunks
     
+    def ingest_paths( self,
+        paths: List[Path],
+        *,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        progress: Optional[Callable[..., None]] = None,) -> "FaissManager":
+        """Load, split, embed and index already-saved files; returns the FaissManager holding the index."""
+        timer = StageTimer()
+        if progress:
+            progress(stage="parsing", files=len(paths))
+        with timer.stage("load"):
+            docs = load_documents(paths)
+        if not docs:
+            raise ValueError("No valid documents loaded")
+        if progress:
+            progress(stage="splitting", pages_parsed=len(docs))
+
+        with timer.stage("split"):
+            chunks = self._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        if progress:
+            progress(chunks_total=len(chunks))
+        fm = self._faiss_manager()
+
+        added = fm.add_documents(chunks, progress=progress)
+        timer.merge(fm.last_timings)
+        self.last_timings = timer.timings
+        self.log.info("FAISS index updated", added=added, chunks=len(chunks), index=str(self.faiss_dir),
+                      timings_ms=timer.timings, total_ms=timer.total_ms)
+        return fm
+
     def built_retriver( self,
         uploaded_files: Iterable,
         *,
@@ -144,31 +343,51 @@ class ChatIngestor:
         chunk_overlap: int = 200,
         k: int = 5,):
         try:
-            paths = save_uploaded_files(uploaded_files, self.temp_dir)
-            docs = load_documents(paths)
-            if not docs:
-                raise ValueError("No valid documents loaded")
-            
-            chunks = self._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-            fm = FaissManager(self.faiss_dir, self.model_loader)
-            
-            texts = [c.page_content for c in chunks]
-            metas = [c.metadata for c in chunks]
-            
-            try:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-            except Exception:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-                
-            added = fm.add_documents(chunks)
-            self.log.info("FAISS index updated", added=added, index=str(self.faiss_dir))
+            timer = StageTimer()
+            with timer.stage("save"):
+                paths = save_uploaded_files(uploaded_files, self.temp_dir)
+            fm = self.ingest_paths(paths, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            timer.merge(self.last_timings)
+            self.last_timings = timer.timings
             
-            return vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
+            return fm.vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
             
         except Exception as e:
             self.log.error("Failed to build retriever", error=str(e))
             raise DocumentPortalException("Failed to build retriever", e) from e         
                   
+    async def abuilt_retriver( self,
+        uploaded_files: Iterable,
+        *,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        k: int = 5,):
+        """Async built_retriver: file/parse/split work on the blocking pool, embeddings awaited."""
+        try:
+            timer = StageTimer()
+            with timer.stage("save"):
+                paths = await run_blocking(save_uploaded_files, uploaded_files, self.temp_dir)
+            with timer.stage("load"):
+                docs = await run_blocking(load_documents, paths)
+            if not docs:
+                raise ValueError("No valid documents loaded")
+
+            with timer.stage("split"):
+                chunks = await run_blocking(self._split, docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            fm = await run_blocking(self._faiss_manager)
+
+            added = await fm.aadd_documents(chunks)
+            timer.merge(fm.last_timings)
+            self.last_timings = timer.timings
+            self.log.info("FAISS index updated", added=added, chunks=len(chunks), index=str(self.faiss_dir),
+                          timings_ms=timer.timings, total_ms=timer.total_ms)
+
+            return fm.vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
+
+        except Exception as e:
+            self.log.error("Failed to build retriever", error=str(e))
+            raise DocumentPortalException("Failed to build retriever", e) from e
+
 class DocHandler:
     """
     PDF save + read (page-wise) for analysis.
@@ -179,6 +398,7 @@ class DocHandler:
         self.session_id = session_id or _session_id("session")
         self.session_path = os.path.join(self.data_dir, self.session_id)
         os.makedirs(self.session_path, exist_ok=True)
+        self.uploads: Dict[str, SavedUpload] = {}
         self.log.info("DocHandler initialized", session_id=self.session_id, session_path=self.session_path)
 
     def save_pdf(self, uploaded_file) -> str:
@@ -187,12 +407,10 @@ class DocHandler:
             if not filename.lower().endswith(".pdf"):
                 raise ValueError("Invalid file type. Only PDFs are allowed.")
             save_path = os.path.join(self.session_path, filename)
-            with open(save_path, "wb") as f:
-                if hasattr(uploaded_file, "read"):
-                    f.write(uploaded_file.read())
-                else:
-                    f.write(uploaded_file.getbuffer())
-            self.log.info("PDF saved successfully", file=filename, save_path=save_path, session_id=self.session_id)
+            info = stream_upload_to_file(uploaded_file, Path(save_path))
+            self.uploads[save_path] = info
+            self.log.info("PDF saved successfully", file=filename, save_path=save_path, session_id=self.session_id,
+                          size=info.size, sha256=info.sha256)
             return save_path
         except Exception as e:
             self.log.error("Failed to save PDF", error=str(e), session_id=self.session_id)
@@ -200,11 +418,11 @@ class DocHandler:
 
     def read_pdf(self, pdf_path: str) -> str:
         try:
-            text_chunks = []
-            with fitz.open(pdf_path) as doc:
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text_chunks.append(f"\n--- Page {page_num + 1} ---\n{page.get_text()}")  # type: ignore
+            upload = self.uploads.get(pdf_path)
+            extracted = get_extraction_cache().get(pdf_path, sha256=upload.sha256 if upload else None)
+            text_chunks = [
+                f"\n--- Page {page_num + 1} ---\n{page_text}" for page_num, page_text in enumerate(extracted.pages)
+            ]
             text = "\n".join(text_chunks)
             self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=len(text_chunks))
             return text
@@ -222,6 +440,7 @@ class DocumentComparator:
         self.session_id = session_id or _session_id()
         self.session_path = self.base_dir / self.session_id
         self.session_path.mkdir(parents=True, exist_ok=True)
+        self.uploads: Dict[str, SavedUpload] = {}
         self.log.info("DocumentComparator initialized", session_path=str(self.session_path))
 
     def save_uploaded_files(self, reference_file, actual_file):
@@ -231,11 +450,7 @@ class DocumentComparator:
             for fobj, out in ((reference_file, ref_path), (actual_file, act_path)):
                 if not fobj.name.lower().endswith(".pdf"):
                     raise ValueError("Only PDF files are allowed.")
-                with open(out, "wb") as f:
-                    if hasattr(fobj, "read"):
-                        f.write(fobj.read())
-                    else:
-                        f.write(fobj.getbuffer())
+                self.uploads[str(out)] = stream_upload_to_file(fobj, out)
             self.log.info("Files saved", reference=str(ref_path), actual=str(act_path), session=self.session_id)
             return ref_path, act_path
         except Exception as e:
@@ -244,21 +459,33 @@ class DocumentComparator:
 
     def read_pdf(self, pdf_path: Path) -> str:
         try:
-            with fitz.open(pdf_path) as doc:
-                if doc.is_encrypted:
-                    raise ValueError(f"PDF is encrypted: {pdf_path.name}")
-                parts = []
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text = page.get_text()  # type: ignore
-                    if text.strip():
-                        parts.append(f"\n --- Page {page_num + 1} --- \n{text}")
+            upload = self.uploads.get(str(pdf_path))
+            extracted = get_extraction_cache().get(pdf_path, sha256=upload.sha256 if upload else None)
+            if extracted.encrypted:
+                raise ValueError(f"PDF is encrypted: {pdf_path.name}")
+            parts = []
+            for page_num, text in enumerate(extracted.pages):
+                if text.strip():
+                    parts.append(f"\n --- Page {page_num + 1} --- \n{text}")
             self.log.info("PDF read successfully", file=str(pdf_path), pages=len(parts))
             return "\n".join(parts)
         except Exception as e:
             self.log.error("Error reading PDF", file=str(pdf_path), error=str(e))
             raise DocumentPortalException("Error reading PDF", e) from e
 
+    def read_pages(self, pdf_path: Path) -> List[str]:
+        """Text of every page, blank pages included, for page-level diffing."""
+        try:
+            upload = self.uploads.get(str(pdf_path))
+            extracted = get_extraction_cache().get(pdf_path, sha256=upload.sha256 if upload else None)
+            if extracted.encrypted:
+                raise ValueError(f"PDF is encrypted: {pdf_path.name}")
+            self.log.info("PDF pages read", file=str(pdf_path), pages=len(extracted.pages))
+            return list(extracted.pages)
+        except Exception as e:
+            self.log.error("Error reading PDF", file=str(pdf_path), error=str(e))
+            raise DocumentPortalException("Error reading PDF", e) from e
+
     def combine_documents(self) -> str:
         try:
             doc_parts = []
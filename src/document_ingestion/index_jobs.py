@@ -0,0 +1,226 @@
+from __future__ import annotations
+import functools
+import json
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from logger.custom_logger import CustomLogger
+from utils.file_io import SavedUpload
+from utils.job_store import JobStore
+from src.document_ingestion.data_ingestion import ChatIngestor
+
+log = CustomLogger().get_logger(__name__)
+
+TERMINAL_STATES = {"succeeded", "failed"}
+ACTIVE_STATES = {"queued", "running"}
+DEFAULT_JOBS_PATH = "index_jobs/jobs.sqlite3"
+
+
+@dataclass
+class IndexJob:
+    job_id: str
+    session_id: str
+    dedupe_key: Optional[Tuple[Any, ...]]
+    files: int
+    status: str = "queued"          # queued | running | succeeded | failed
+    stage: str = "queued"           # queued | parsing | splitting | embedding | writing | done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pages_parsed: int = 0
+    chunks_total: int = 0
+    chunks_new: int = 0
+    chunks_embedded: int = 0
+    vectors_written: int = 0
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    version: int = 0                # bumped on every update; lets pollers detect change
+    embed_started_at: Optional[float] = None
+
+    def update(self, stage: Optional[str] = None, **counters: Any):
+        if stage is not None:
+            self.stage = stage
+            if stage == "embedding":
+                self.embed_started_at = time.time()
+        for name, value in counters.items():
+            if hasattr(self, name) and not name.startswith("_"):
+                setattr(self, name, value)
+        self.version += 1
+
+    def to_record(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record.pop("dedupe_key")
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "IndexJob":
+        names = {f.name for f in fields(cls)}
+        return cls(dedupe_key=None, **{k: v for k, v in record.items() if k in names and k != "dedupe_key"})
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        load_s = self.timings_ms.get("load", 0.0) / 1000
+        embed_s = (self.timings_ms.get("embed", 0.0) / 1000
+                   or (now - self.embed_started_at if self.embed_started_at else 0.0))
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "status": self.status,
+            "stage": self.stage,
+            "files": self.files,
+            "pages_parsed": self.pages_parsed,
+            "chunks_total": self.chunks_total,
+            "chunks_new": self.chunks_new,
+            "chunks_embedded": self.chunks_embedded,
+            "vectors_written": self.vectors_written,
+            "elapsed_s": round(elapsed, 3),
+            "throughput": {
+                "pages_per_s": round(self.pages_parsed / load_s, 2) if load_s else None,
+                "chunks_embedded_per_s": round(self.chunks_embedded / embed_s, 2) if embed_s else None,
+            },
+            "timings_ms": self.timings_ms,
+            "error": self.error,
+        }
+
+
+class IndexJobManager:
+    """
+    Runs /chat/index work in the background on a bounded worker pool.
+
+    Job state lives in a SQLite JobStore shared by every worker process, so a job
+    submitted to one worker can be polled from any other; the worker running a job
+    writes each progress update through to it. Submissions naming the same session
+    and the same file contents (by sha256) are merged into the job for them that is
+    still queued or running, in whichever worker; once it has finished, the same
+    files can be submitted again. A queued or running job not updated for
+    stale_after_s is taken to belong to a worker that died and is no longer merged
+    into. Submissions without a session id are never merged, since each one gets
+    its own generated session. Jobs writing the same index directory run one at a time.
+    """
+    def __init__(self, max_workers: int = 2, retention: int = 1000, path: str = DEFAULT_JOBS_PATH,
+                 stale_after_s: float = 3600.0):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-job")
+        self._store = JobStore(path, retention=retention)
+        self._lock = threading.Lock()
+        self._running: Dict[str, IndexJob] = {}   # jobs this process runs, served live
+        self._dir_locks: Dict[str, threading.Lock] = {}
+        self.stale_after_s = stale_after_s
+
+    @staticmethod
+    def dedupe_key(
+        session_id: Optional[str], use_session_dirs: bool, uploads: List[SavedUpload],
+        chunk_size: int, chunk_overlap: int,
+    ) -> Optional[Tuple[Any, ...]]:
+        """Merge key for a submission; None (never merged) without an explicit session id."""
+        if not session_id:
+            return None
+        return (session_id, use_session_dirs, tuple(sorted(u.sha256 for u in uploads)), chunk_size, chunk_overlap)
+
+    @staticmethod
+    def _key_text(key: Optional[Tuple[Any, ...]]) -> Optional[str]:
+        return json.dumps(key) if key is not None else None
+
+    def _job(self, record: Dict[str, Any]) -> IndexJob:
+        with self._lock:
+            live = self._running.get(record["job_id"])
+        return live if live is not None else IndexJob.from_record(record)
+
+    def find(self, key: Optional[Tuple[Any, ...]]) -> Optional[IndexJob]:
+        record = self._store.active(self._key_text(key), ACTIVE_STATES, self.stale_after_s)
+        return self._job(record) if record is not None else None
+
+    def submit(
+        self,
+        key: Optional[Tuple[Any, ...]],
+        ingestor: ChatIngestor,
+        staged: List[SavedUpload],
+        *,
+        chunk_size: int,
+        chunk_overlap: int,
+    ) -> Tuple[IndexJob, bool]:
+        """Queue a job for files already saved in a staging dir; returns (job, merged_into_existing)."""
+        job = IndexJob(job_id=uuid.uuid4().hex, session_id=ingestor.session_id, dedupe_key=key, files=len(staged))
+        with self._lock:
+            record, merged = self._store.claim(job.job_id, self._key_text(key), job.status, job.to_record(),
+                                               ACTIVE_STATES, TERMINAL_STATES, self.stale_after_s)
+            if not merged:
+                self._running[job.job_id] = job
+                dir_lock = self._dir_locks.setdefault(str(ingestor.faiss_dir.resolve()), threading.Lock())
+        if merged:
+            return self._job(record), True
+        self._executor.submit(self._run, job, ingestor, staged, dir_lock, chunk_size, chunk_overlap)
+        log.info("Index job queued", job_id=job.job_id, session_id=job.session_id, files=job.files)
+        return job, False
+
+    def _update(self, job: IndexJob, stage: Optional[str] = None, **counters: Any):
+        job.update(stage, **counters)
+        try:
+            self._store.save(job.job_id, job.status, job.to_record())
+        except Exception as e:
+            # progress is best effort; a failed write must not fail the ingest itself
+            log.warning("Index job state not saved", job_id=job.job_id, error=str(e))
+
+    def _run(self, job: IndexJob, ingestor: ChatIngestor, staged: List[SavedUpload],
+             dir_lock: threading.Lock, chunk_size: int, chunk_overlap: int):
+        try:
+            with dir_lock:
+                job.status = "running"
+                job.started_at = time.time()
+                self._update(job)
+                paths = []
+                for info in staged:
+                    dest = ingestor.temp_dir / info.path.name
+                    shutil.move(str(info.path), dest)
+                    paths.append(dest)
+                ingestor.ingest_paths(paths, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                      progress=functools.partial(self._update, job))
+            job.timings_ms = ingestor.last_timings
+            job.status = "succeeded"
+            job.finished_at = time.time()
+            self._update(job, stage="done")
+            log.info("Index job finished", **job.to_dict())
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            job.finished_at = time.time()
+            self._update(job, stage="failed")
+            log.error("Index job failed", job_id=job.job_id, session_id=job.session_id, error=str(e))
+        finally:
+            with self._lock:
+                self._running.pop(job.job_id, None)
+            for info in staged:
+                info.path.unlink(missing_ok=True)
+            if staged:
+                shutil.rmtree(staged[0].path.parent, ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            live = self._running.get(job_id)
+        if live is not None:
+            return live
+        record = self._store.get(job_id)
+        return IndexJob.from_record(record) if record is not None else None
+
+
+_manager: Optional[IndexJobManager] = None
+_manager_lock = threading.Lock()
+
+def get_index_job_manager() -> IndexJobManager:
+    """Process-wide job manager sized from config.yaml `index_jobs`."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                from utils.model_loader import get_model_registry
+                cfg = get_model_registry().config.get("index_jobs", {}) or {}
+                _manager = IndexJobManager(max_workers=int(cfg.get("max_workers", 2)),
+                                           retention=int(cfg.get("retention", 1000)),
+                                           path=cfg.get("path", DEFAULT_JOBS_PATH),
+                                           stale_after_s=float(cfg.get("stale_after_s", 3600)))
+    return _manager
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 3600.0
+
+Scope = Tuple[str, ...]
+Key = Tuple[Scope, Tuple[int, ...], str, Tuple[str, ...]]
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    return _SPACE_RE.sub(" ", text).strip().rstrip("?!.").strip().lower()
+
+
+def chunk_ids(docs: Iterable[Document]) -> Tuple[str, ...]:
+    """
+    Stable ids for retrieved chunks: a digest of source + text. Docstore ids are
+    not used because compaction renumbers them without changing any content.
+    """
+    ids = []
+    for d in docs:
+        md = d.metadata or {}
+        h = hashlib.sha256(str(md.get("source") or md.get("file_path") or "").encode("utf-8"))
+        h.update(b"\0")
+        h.update(d.page_content.encode("utf-8"))
+        ids.append(h.hexdigest()[:32])
+    return tuple(ids)
+
+
+def index_scope(index_dirs: Iterable[str]) -> Scope:
+    return tuple(sorted(os.path.abspath(d) for d in index_dirs))
+
+
+@dataclass
+class _Entry:
+    answer: str
+    expires: float
+    alias: Optional[Tuple[Scope, Tuple[int, ...], str]]
+    embedding: Optional[np.ndarray]
+
+
+class AnswerCache:
+    """
+    In-memory LRU cache of RAG answers with a TTL.
+
+    An answer is keyed by (index scope, content version, normalized rewritten
+    question, retrieved chunk ids), so it is only reused when the same question
+    retrieved the same context from the same index contents. First-turn
+    questions (no chat history) also get an alias on the user's own wording and,
+    when similarity_threshold is set, their query embedding; lookup() checks
+    those before the rewrite and retrieval, so a repeat costs no LLM calls.
+    The content version is the vector count of each index in the scope, which
+    only changes on ingest; FaissManager also calls invalidate() when it adds
+    documents to an index.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._aliases: Dict[Tuple[Scope, Tuple[int, ...], str], Key] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.alias_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ---------- Lookup ----------
+
+    def lookup(self, scope: Scope, version: Sequence[int], question: str,
+               embedding: Optional[List[float]] = None) -> Optional[str]:
+        """Pre-retrieval lookup for a first-turn question: exact wording, then nearest embedding."""
+        version = tuple(version)
+        now = time.monotonic()
+        with self._lock:
+            key = self._aliases.get((scope, version, normalize_question(question)))
+            entry = self._live(key, now) if key is not None else None
+            if entry is not None:
+                self.alias_hits += 1
+                return entry.answer
+            if embedding is not None and self.similarity_threshold is not None:
+                key, score = self._nearest(scope, version, embedding, now)
+                if key is not None and score >= self.similarity_threshold:
+                    self.semantic_hits += 1
+                    log.info("Answer cache semantic hit", similarity=round(score, 4))
+                    return self._entries[key].answer
+        return None
+
+    def get(self, scope: Scope, version: Sequence[int], question: str, chunks: Tuple[str, ...]) -> Optional[str]:
+        key = (scope, tuple(version), normalize_question(question), chunks)
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.answer
+
+    def _live(self, key: Key, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, scope: Scope, version: Tuple[int, ...], embedding: List[float],
+                 now: float) -> Tuple[Optional[Key], float]:
+        query = _unit(embedding)
+        best, best_score = None, -1.0
+        for key, entry in self._entries.items():
+            if entry.embedding is None or key[0] != scope or key[1] != version or entry.expires <= now:
+                continue
+            score = float(np.dot(entry.embedding, query))
+            if score > best_score:
+                best, best_score = key, score
+        if best is not None:
+            self._entries.move_to_end(best)
+        return best, best_score
+
+    # ---------- Update ----------
+
+    def put(self, scope: Scope, version: Sequence[int], question: str, chunks: Tuple[str, ...], answer: str, *,
+            alias: Optional[str] = None, embedding: Optional[List[float]] = None):
+        version = tuple(version)
+        key = (scope, version, normalize_question(question), chunks)
+        alias_key = (scope, version, normalize_question(alias)) if alias is not None else None
+        entry = _Entry(answer, time.monotonic() + self.ttl_seconds, alias_key,
+                       _unit(embedding) if embedding is not None else None)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            if alias_key is not None:
+                self._aliases[alias_key] = key
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Key):
+        entry = self._entries.pop(key)
+        if entry.alias is not None and self._aliases.get(entry.alias) == key:
+            del self._aliases[entry.alias]
+
+    def invalidate(self, index_dir: str) -> int:
+        """Drop every answer whose scope includes index_dir; returns how many were dropped."""
+        path = os.path.abspath(index_dir)
+        with self._lock:
+            stale = [key for key in self._entries if path in key[0]]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+        if stale:
+            log.info("Answer cache invalidated", index_dir=path, entries=len(stale))
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = self.hits + self.alias_hits + self.semantic_hits
+            lookups = served + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self.hits,
+                "alias_hits": self.alias_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    v = np.asarray(embedding, dtype=np.float32)
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+_cache: Optional[AnswerCache] = None
+_configured = False
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache from config.yaml `answer_cache`; None when disabled."""
+    global _cache, _configured
+    if not _configured:
+        with _cache_lock:
+            if not _configured:
+                from utils.model_loader import get_model_registry
+                cfg = get_model_registry().config.get("answer_cache", {}) or {}
+                if cfg.get("enabled", True):
+                    threshold = cfg.get("similarity_threshold")
+                    _cache = AnswerCache(
+                        max_entries=int(cfg.get("max_entries", DEFAULT_MAX_ENTRIES)),
+                        ttl_seconds=float(cfg.get("ttl_seconds", DEFAULT_TTL_SECONDS)),
+                        similarity_threshold=float(threshold) if threshold is not None else None,
+                    )
+                _configured = True
+    return _cache
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import heapq
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+BM25_FILE = "bm25.sqlite3"
+_PARAM_BATCH = 500
+_COMMON_DF = 0.5  # query terms in more than this share of documents are skipped if rarer ones exist
+
+# words and identifiers; "14.3.2", "AB-1234" and "v2/api" stay whole tokens
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[._\-/:][^\W_]+)*")
+_SPLIT_RE = re.compile(r"[._\-/:]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words; compound identifiers are emitted whole and as their parts."""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(p for p in _SPLIT_RE.split(token) if p)
+    return tokens
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index stored in SQLite next to a FAISS index.
+
+    Documents are keyed by their position in the segmented index (base rows,
+    then each segment in manifest order), which compaction preserves. Postings
+    are (term_id, doc, tf) rows in a WITHOUT ROWID table, so adding a batch only
+    touches the terms it contains.
+    """
+    def __init__(self, path: Union[str, Path], k1: float = 1.2, b: float = 0.75):
+        try:
+            self.path = Path(path)
+            self.k1, self.b = k1, b
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE, df INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS postings (term_id INTEGER NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL,"
+                " PRIMARY KEY (term_id, doc)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS docs (doc INTEGER PRIMARY KEY, len INTEGER NOT NULL);"
+            )
+        except Exception as e:
+            log.error("Failed to open BM25 index", error=str(e), path=str(path))
+            raise DocumentPortalException("Failed to open BM25 index", e) from e
+
+    def add(self, start: int, texts: Iterable[str]) -> int:
+        """Index texts as docs start, start+1, ... in one transaction; returns how many were added."""
+        docs: List[Tuple[int, int]] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, text in enumerate(texts, start):
+            counts = Counter(tokenize(text or ""))
+            docs.append((doc, sum(counts.values())))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+        if not docs:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO docs (doc, len) VALUES (?, ?)", docs)
+                self._conn.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                    [(term, len(rows)) for term, rows in postings.items()],
+                )
+                ids = self._term_ids(list(postings))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO postings (term_id, doc, tf) VALUES (?, ?, ?)",
+                    ((ids[term], doc, tf) for term, rows in postings.items() for doc, tf in rows),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(docs)
+
+    def _term_ids(self, terms: List[str]) -> Dict[str, int]:
+        ids: Dict[str, int] = {}
+        for i in range(0, len(terms), _PARAM_BATCH):
+            batch = terms[i:i + _PARAM_BATCH]
+            marks = ",".join("?" * len(batch))
+            ids.update(self._conn.execute(f"SELECT term, id FROM terms WHERE term IN ({marks})", batch))
+        return ids
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Top-k (doc, bm25 score), best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            n, total_len = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(len), 0) FROM docs").fetchone()
+            if not n:
+                return []
+            marks = ",".join("?" * len(terms))
+            term_rows = self._conn.execute(f"SELECT id, df FROM terms WHERE term IN ({marks})", terms).fetchall()
+            if not term_rows:
+                return []
+            # terms in most documents add ~nothing to the score but dominate the postings scan
+            rare = [(tid, df) for tid, df in term_rows if df <= n * _COMMON_DF]
+            idf = {tid: math.log(1 + (n - df + 0.5) / (df + 0.5)) for tid, df in rare or term_rows}
+            marks = ",".join("?" * len(idf))
+            rows = self._conn.execute(
+                f"SELECT p.term_id, p.doc, p.tf, d.len FROM postings p JOIN docs d ON d.doc = p.doc"
+                f" WHERE p.term_id IN ({marks})", list(idf),
+            ).fetchall()
+        avg_len = total_len / n or 1.0
+        scores: Dict[int, float] = {}
+        for tid, doc, tf, length in rows:
+            norm = tf + self.k1 * (1 - self.b + self.b * length / avg_len)
+            scores[doc] = scores.get(doc, 0.0) + idf[tid] * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def doc_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.executescript("BEGIN; DELETE FROM postings; DELETE FROM terms; DELETE FROM docs; COMMIT;")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
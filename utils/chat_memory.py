@@ -0,0 +1,206 @@
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+
+from utils.tokens import estimate_tokens
+from utils.concurrency import run_blocking
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+from prompt.prompt_library import PROMPT_REGISTRY
+from model.models import PromptType
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_MEMORY_PATH = "chat_memory/chat.sqlite3"
+DEFAULT_WINDOW_TOKENS = 2000
+DEFAULT_SUMMARY_TOKENS = 300
+
+
+class ChatMemory:
+    """
+    Server-side chat history per conversation, stored in SQLite and keyed by the
+    caller's conversation id (the `session_id` column predates that).
+
+    history() returns a rolling summary of older turns (as a system message)
+    followed by the most recent turns that fit in window_tokens. Once the
+    unsummarized turns outgrow the window, summarize() folds the oldest of
+    them into the summary with one LLM call, leaving about half the window as
+    verbatim turns. Callers run summarize() after answering, off the request path.
+    """
+    def __init__(self, path: str = DEFAULT_MEMORY_PATH, window_tokens: int = DEFAULT_WINDOW_TOKENS,
+                 summary_tokens: int = DEFAULT_SUMMARY_TOKENS):
+        try:
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.window_tokens = window_tokens
+            self.summary_tokens = summary_tokens
+            self._lock = threading.Lock()
+            self._summarizing: Dict[str, threading.Lock] = {}
+            self._summarizing_lock = threading.Lock()  # separate from _lock: taken on the event loop
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS turns (session_id TEXT NOT NULL, seq INTEGER NOT NULL,"
+                " question TEXT NOT NULL, answer TEXT NOT NULL, tokens INTEGER NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (session_id, seq)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS summaries (session_id TEXT PRIMARY KEY, summary TEXT NOT NULL,"
+                " upto INTEGER NOT NULL) WITHOUT ROWID;"
+            )
+        except Exception as e:
+            log.error("Failed to open chat memory", error=str(e), path=str(path))
+            raise DocumentPortalException("Failed to open chat memory", e) from e
+
+    # ---------- Read ----------
+
+    def _state(self, session_id: str) -> Tuple[str, int, List[Tuple[int, str, str, int]]]:
+        """(summary, summarized-through seq, unsummarized turns oldest first)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, upto FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            summary, upto = row if row else ("", -1)
+            turns = self._conn.execute(
+                "SELECT seq, question, answer, tokens FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, upto),
+            ).fetchall()
+        return summary, upto, turns
+
+    def history(self, session_id: str) -> List[BaseMessage]:
+        summary, _, turns = self._state(session_id)
+        budget = self.window_tokens - (estimate_tokens(summary) if summary else 0)
+        recent: List[BaseMessage] = []
+        # newest first until the window is full; summarization normally keeps this from trimming
+        for _, question, answer, tokens in reversed(turns):
+            if tokens > budget and recent:
+                break
+            budget -= tokens
+            recent[:0] = [HumanMessage(question), AIMessage(answer)]
+        if summary:
+            recent.insert(0, SystemMessage(f"Summary of the earlier conversation: {summary}"))
+        return recent
+
+    # ---------- Write ----------
+
+    def append(self, session_id: str, question: str, answer: str):
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO turns (session_id, seq, question, answer, tokens, created)"
+                " SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ?, ? FROM turns WHERE session_id = ?",
+                (session_id, question, answer, tokens, time.time(), session_id),
+            )
+
+    def clear(self, session_id: str) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            n = self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,)).rowcount
+            self._conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+            self._conn.execute("COMMIT")
+        return n
+
+    # ---------- Summarization ----------
+
+    def _to_fold(self, session_id: str) -> Optional[Tuple[str, int, List[Tuple[int, str, str, int]]]]:
+        """Oldest turns to fold into the summary, or None while the window still fits."""
+        summary, _, turns = self._state(session_id)
+        total = sum(t[3] for t in turns)
+        if total <= self.window_tokens:
+            return None
+        keep = self.window_tokens // 2
+        fold = []
+        for turn in turns:
+            if total <= keep:
+                break
+            fold.append(turn)
+            total -= turn[3]
+        return summary, fold[-1][0], fold
+
+    def _summary_input(self, summary: str, fold: List[Tuple[int, str, str, int]]) -> Dict[str, Any]:
+        conversation = "\n".join(f"User: {q}\nAssistant: {a}" for _, q, a, _ in fold)
+        return {"summary": summary or "(none)", "conversation": conversation, "max_tokens": self.summary_tokens}
+
+    def _save_summary(self, session_id: str, summary: str, upto: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO summaries (session_id, summary, upto) VALUES (?, ?, ?)"
+                " ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, upto = excluded.upto"
+                " WHERE excluded.upto > summaries.upto",
+                (session_id, summary, upto),
+            )
+        log.info("Chat history summarized", session_id=session_id, upto=upto, summary_chars=len(summary))
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._summarizing_lock:
+            return self._summarizing.setdefault(session_id, threading.Lock())
+
+    def summarize(self, session_id: str, llm) -> bool:
+        """Fold old turns into the summary if the window overflowed; returns whether it did."""
+        lock = self._session_lock(session_id)
+        if not lock.acquire(blocking=False):
+            return False  # another request is already summarizing this session
+        try:
+            pending = self._to_fold(session_id)
+            if pending is None:
+                return False
+            summary, upto, fold = pending
+            chain = PROMPT_REGISTRY[PromptType.CHAT_SUMMARY.value] | llm | StrOutputParser()
+            self._save_summary(session_id, chain.invoke(self._summary_input(summary, fold)).strip(), upto)
+            return True
+        except Exception as e:
+            # the next turn retries; history() still trims to the window meanwhile
+            log.warning("Chat history summarization failed", session_id=session_id, error=str(e))
+            return False
+        finally:
+            lock.release()
+
+    async def asummarize(self, session_id: str, llm) -> bool:
+        lock = self._session_lock(session_id)
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            pending = await run_blocking(self._to_fold, session_id)
+            if pending is None:
+                return False
+            summary, upto, fold = pending
+            chain = PROMPT_REGISTRY[PromptType.CHAT_SUMMARY.value] | llm | StrOutputParser()
+            folded = (await chain.ainvoke(self._summary_input(summary, fold))).strip()
+            await run_blocking(self._save_summary, session_id, folded, upto)
+            return True
+        except Exception as e:
+            log.warning("Chat history summarization failed", session_id=session_id, error=str(e))
+            return False
+        finally:
+            lock.release()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_memory: Optional[ChatMemory] = None
+_configured = False
+_memory_lock = threading.Lock()
+
+def get_chat_memory() -> Optional[ChatMemory]:
+    """Process-wide chat memory from config.yaml `chat_memory`; None when disabled."""
+    global _memory, _configured
+    if not _configured:
+        with _memory_lock:
+            if not _configured:
+                from utils.model_loader import get_model_registry
+                cfg = get_model_registry().config.get("chat_memory", {}) or {}
+                if cfg.get("enabled", True):
+                    _memory = ChatMemory(
+                        path=cfg.get("path", DEFAULT_MEMORY_PATH),
+                        window_tokens=int(cfg.get("window_tokens", DEFAULT_WINDOW_TOKENS)),
+                        summary_tokens=int(cfg.get("summary_tokens", DEFAULT_SUMMARY_TOKENS)),
+                    )
+                _configured = True
+    return _memory
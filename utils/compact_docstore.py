@@ -0,0 +1,275 @@
+"""
+Compact on-disk docstore for FAISS parts, replacing the pickled
+(InMemoryDocstore, index_to_docstore_id) tuple that FAISS.save_local writes.
+
+Layout for a part named <name> (row i = FAISS vector i):
+    <name>.ds.json         row count, block size, metadata column names + value dictionaries
+    <name>.ds.offsets.npy  int64[n + 1]        text offsets in the uncompressed text stream
+    <name>.ds.blocks.npy   int64[blocks + 1]   byte offsets of each zlib block in .ds.text
+    <name>.ds.text         zlib-compressed blocks of BLOCK_ROWS consecutive texts
+    <name>.ds.codes.npy    int32[n, columns]   metadata dictionary codes, -1 = key absent
+
+Everything except the small JSON header is memory-mapped; a Document is only
+built for rows a search actually returns.
+
+Convert existing pickled indexes with:
+    python -m utils.compact_docstore faiss_index
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+FORMAT_VERSION = 1
+BLOCK_ROWS = 32          # texts per compressed block
+BLOCK_CACHE_SIZE = 64    # decompressed blocks kept per open docstore
+DOCSTORE_SUFFIXES = (".ds.offsets.npy", ".ds.blocks.npy", ".ds.text", ".ds.codes.npy", ".ds.json")  # header last
+
+
+def docstore_paths(folder: Union[str, Path], name: str) -> List[Path]:
+    return [Path(folder) / f"{name}{suffix}" for suffix in DOCSTORE_SUFFIXES]
+
+
+def has_docstore(folder: Union[str, Path], name: str) -> bool:
+    return (Path(folder) / f"{name}.ds.json").exists()
+
+
+def _encode_value(value: Any) -> str:
+    try:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+    except TypeError:
+        return json.dumps(str(value), ensure_ascii=False)
+
+
+def write_docstore(folder: Union[str, Path], name: str, docs: Iterable[Tuple[str, Dict[str, Any]]],
+                   block_rows: int = BLOCK_ROWS) -> int:
+    """Write (text, metadata) rows in FAISS row order; returns the row count."""
+    folder = Path(folder)
+    offsets: List[int] = [0]
+    block_offsets: List[int] = [0]
+    columns: Dict[str, Dict[str, int]] = {}   # column -> encoded value -> code, in first-seen order
+    column_index: Dict[str, int] = {}
+    row_codes: List[Dict[int, int]] = []
+    pending: List[bytes] = []
+
+    with open(folder / f"{name}.ds.text", "wb") as text_out:
+        def flush():
+            blob = zlib.compress(b"".join(pending), 6)
+            text_out.write(blob)
+            block_offsets.append(block_offsets[-1] + len(blob))
+            pending.clear()
+
+        for text, metadata in docs:
+            raw = (text or "").encode("utf-8")
+            pending.append(raw)
+            offsets.append(offsets[-1] + len(raw))
+            codes: Dict[int, int] = {}
+            for key, value in (metadata or {}).items():
+                if key not in columns:
+                    column_index[key] = len(columns)
+                    columns[key] = {}
+                col = columns[key]
+                codes[column_index[key]] = col.setdefault(_encode_value(value), len(col))
+            row_codes.append(codes)
+            if len(pending) >= block_rows:
+                flush()
+        if pending:
+            flush()
+
+    n = len(row_codes)
+    code_matrix = np.full((n, len(columns)), -1, dtype=np.int32)
+    for i, codes in enumerate(row_codes):
+        for c, code in codes.items():
+            code_matrix[i, c] = code
+    np.save(folder / f"{name}.ds.offsets.npy", np.asarray(offsets, dtype=np.int64))
+    np.save(folder / f"{name}.ds.blocks.npy", np.asarray(block_offsets, dtype=np.int64))
+    np.save(folder / f"{name}.ds.codes.npy", code_matrix)
+    header = {
+        "format": FORMAT_VERSION,
+        "rows": n,
+        "block_rows": block_rows,
+        "columns": [{"name": key, "values": list(values)} for key, values in columns.items()],
+    }
+    # header last: its presence marks the docstore complete
+    tmp = folder / f"{name}.ds.json.tmp"
+    tmp.write_text(json.dumps(header, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, folder / f"{name}.ds.json")
+    return n
+
+
+class LazyIdMap:
+    """index_to_docstore_id stand-in: row i maps to "<part>:<i>" without storing n strings."""
+    def __init__(self, part: str, rows: int):
+        self.part = part
+        self.rows = rows
+
+    def __getitem__(self, i: int) -> str:
+        i = int(i)
+        if not 0 <= i < self.rows:
+            raise KeyError(i)
+        return f"{self.part}:{i}"
+
+    def get(self, i: int, default: Optional[str] = None) -> Optional[str]:
+        try:
+            return self[i]
+        except KeyError:
+            return default
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __contains__(self, i: object) -> bool:
+        return isinstance(i, (int, np.integer)) and 0 <= int(i) < self.rows
+
+    def keys(self) -> Iterator[int]:
+        return iter(range(self.rows))
+
+    def values(self) -> Iterator[str]:
+        return (f"{self.part}:{i}" for i in range(self.rows))
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        return ((i, f"{self.part}:{i}") for i in range(self.rows))
+
+    __iter__ = keys
+
+
+class CompactDocstore(Docstore):
+    """Read-only, memory-mapped docstore; ids are "<part>:<row>"."""
+    def __init__(self, folder: Union[str, Path], name: str):
+        try:
+            folder = Path(folder)
+            self.part = name
+            header = json.loads((folder / f"{name}.ds.json").read_text(encoding="utf-8"))
+            if header.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported docstore format {header.get('format')}")
+            self.rows = int(header["rows"])
+            self.block_rows = int(header["block_rows"])
+            self._columns = [c["name"] for c in header["columns"]]
+            self._values = [c["values"] for c in header["columns"]]
+            self._offsets = np.load(folder / f"{name}.ds.offsets.npy", mmap_mode="r")
+            self._blocks = np.load(folder / f"{name}.ds.blocks.npy", mmap_mode="r")
+            self._codes = np.load(folder / f"{name}.ds.codes.npy", mmap_mode="r")
+            text_path = folder / f"{name}.ds.text"
+            self._text = np.memmap(text_path, dtype=np.uint8, mode="r") if text_path.stat().st_size else np.empty(0, np.uint8)
+            self._block_cache: "OrderedDict[int, bytes]" = OrderedDict()
+            self._cache_lock = threading.Lock()
+        except Exception as e:
+            log.error("Failed to open compact docstore", folder=str(folder), name=name, error=str(e))
+            raise DocumentPortalException("Failed to open compact docstore", e) from e
+
+    def id_map(self) -> LazyIdMap:
+        return LazyIdMap(self.part, self.rows)
+
+    def _block(self, b: int) -> bytes:
+        with self._cache_lock:
+            data = self._block_cache.get(b)
+            if data is not None:
+                self._block_cache.move_to_end(b)
+                return data
+        start, stop = int(self._blocks[b]), int(self._blocks[b + 1])
+        data = zlib.decompress(self._text[start:stop].tobytes())
+        with self._cache_lock:
+            self._block_cache[b] = data
+            if len(self._block_cache) > BLOCK_CACHE_SIZE:
+                self._block_cache.popitem(last=False)
+        return data
+
+    def text(self, row: int) -> str:
+        b = row // self.block_rows
+        base = int(self._offsets[b * self.block_rows])
+        start, stop = int(self._offsets[row]) - base, int(self._offsets[row + 1]) - base
+        return self._block(b)[start:stop].decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        md: Dict[str, Any] = {}
+        for c, code in enumerate(self._codes[row]):
+            if code >= 0:
+                md[self._columns[c]] = json.loads(self._values[c][code])
+        return md
+
+    def document(self, row: int) -> Document:
+        return Document(id=f"{self.part}:{row}", page_content=self.text(row), metadata=self.metadata(row))
+
+    def iter_rows(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for row in range(self.rows):
+            yield self.text(row), self.metadata(row)
+
+    def search(self, search: str) -> Union[str, Document]:
+        part, _, row = str(search).rpartition(":")
+        if part != self.part or not row.isdigit() or int(row) >= self.rows:
+            return f"ID {search} not found."
+        return self.document(int(row))
+
+
+def docstore_rows(docstore: Docstore, index_to_docstore_id: Any, rows: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(text, metadata) for FAISS rows 0..rows-1 of any docstore, in row order."""
+    if isinstance(docstore, CompactDocstore):
+        yield from docstore.iter_rows()
+        return
+    for i in range(rows):
+        doc = docstore.search(index_to_docstore_id[i])
+        if not isinstance(doc, Document):
+            raise ValueError(f"Docstore has no document for row {i}")
+        yield doc.page_content, doc.metadata or {}
+
+
+def faiss_rows(vs: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    return docstore_rows(vs.docstore, vs.index_to_docstore_id, vs.index.ntotal)
+
+
+def convert_part(folder: Union[str, Path], name: str, keep_pickle: bool = False) -> Optional[int]:
+    """Write a compact docstore for a pickled part (<name>.pkl); returns rows written, or None if skipped."""
+    import pickle
+
+    folder = Path(folder)
+    pkl = folder / f"{name}.pkl"
+    if has_docstore(folder, name) or not pkl.exists():
+        return None
+    with open(pkl, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)  # trusted: written by this app's FAISS.save_local
+    rows = write_docstore(folder, name, docstore_rows(docstore, index_to_docstore_id, len(index_to_docstore_id)))
+    if not keep_pickle:
+        pkl.unlink()
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils.segmented_index import SEGMENTS_DIR, dir_lock, read_manifest
+
+    parser = argparse.ArgumentParser(description="Convert pickled FAISS docstores to the compact format.")
+    parser.add_argument("faiss_base", nargs="?", default="faiss_index",
+                        help="FAISS base dir; it and every session_* dir under it are converted")
+    parser.add_argument("--index-name", default="index")
+    parser.add_argument("--keep-pkl", action="store_true", help="keep the .pkl files after conversion")
+    args = parser.parse_args()
+
+    base = Path(args.faiss_base)
+    dirs = [base] + sorted(p for p in base.glob("session_*") if p.is_dir())
+    converted = 0
+    for index_dir in dirs:
+        if not (index_dir / f"{args.index_name}.faiss").exists():
+            continue
+        with dir_lock(index_dir):
+            parts = [(index_dir, args.index_name)]
+            parts += [(index_dir / SEGMENTS_DIR, s) for s in read_manifest(index_dir)["segments"]]
+            for folder, name in parts:
+                rows = convert_part(folder, name, keep_pickle=args.keep_pkl)
+                if rows is not None:
+                    converted += 1
+                    print(f"converted {folder / name}: {rows} rows")
+    print(f"{converted} part(s) converted")
@@ -0,0 +1,19 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Bounded pool for disk I/O, PDF parsing, FAISS loads and other blocking work
+# so request handlers never run it on the event loop.
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on the shared blocking pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
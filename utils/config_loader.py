@@ -6,7 +6,7 @@ def _project_root() -> Path:
     # .../utils/config_loader.py -> parents[1] == project root
     return Path(__file__).resolve().parents[1]
 
-def load_config(config_path: str | None = None) -> dict:
+def resolve_config_path(config_path: str | None = None) -> Path:
     """
     Resolve config path reliably irrespective of CWD.
     Priority: explicit arg > CONFIG_PATH env > <project_root>/config/config.yaml
@@ -18,9 +18,13 @@ def load_config(config_path: str | None = None) -> dict:
     path = Path(config_path)
     if not path.is_absolute():
         path = _project_root() / path
+    return path
+
+def load_config(config_path: str | None = None) -> dict:
+    path = resolve_config_path(config_path)
 
     if not path.exists():
         raise FileNotFoundError(f"Config file not found: {path}")
 
     with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
\ No newline at end of file
+        return yaml.safe_load(f) or {}
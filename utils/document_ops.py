@@ -5,18 +5,23 @@ import json
 import uuid
 import hashlib
 import shutil
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Iterable, List, Optional, Dict, Any
+from typing import Iterable, Iterator, List, Optional, Dict, Any, Tuple
 from fastapi import FastAPI,UploadFile
 
 import fitz  # PyMuPDF
 from langchain.schema import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
+from langchain_community.document_loaders import Docx2txtLoader, TextLoader
 from langchain_community.vectorstores import FAISS
 
 from utils.model_loader import ModelLoader
+from utils.pdf_extract import extract_pdf_pages, pdf_page_count
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 
@@ -24,23 +29,74 @@ log = CustomLogger().get_logger(__name__)
 
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", str(os.cpu_count() or 1)))
+
+_load_pool: Optional[ProcessPoolExecutor] = None
+_load_pool_lock = threading.Lock()
+
+def _get_load_pool() -> ProcessPoolExecutor:
+    global _load_pool
+    if _load_pool is None:
+        with _load_pool_lock:
+            if _load_pool is None:
+                # forkserver: workers start clean (no inherited server threads) and only import utils.pdf_extract
+                _load_pool = ProcessPoolExecutor(max_workers=LOAD_WORKERS, mp_context=mp.get_context("forkserver"))
+    return _load_pool
+
+def _pdf_tasks(path: Path) -> List[Tuple[str, int, int]]:
+    n = pdf_page_count(str(path))
+    return [(str(path), start, min(start + PDF_PAGES_PER_TASK, n)) for start in range(0, n, PDF_PAGES_PER_TASK)]
+
+def _run_pdf_tasks(tasks: List[Tuple[str, int, int]]) -> List[List[Tuple[int, str]]]:
+    if len(tasks) <= 1 or LOAD_WORKERS <= 1:
+        return [extract_pdf_pages(*t) for t in tasks]
+    try:
+        pool = _get_load_pool()
+        futures = [pool.submit(extract_pdf_pages, *t) for t in tasks]
+        return [f.result() for f in futures]
+    except BrokenProcessPool as e:
+        global _load_pool
+        _load_pool = None
+        log.warning("PDF load pool broken; extracting in-process", error=str(e))
+        return [extract_pdf_pages(*t) for t in tasks]
+
 def load_documents(paths: Iterable[Path]) -> List[Document]:
-    """Load docs using appropriate loader based on extension."""
-    docs: List[Document] = []
+    """
+    Load docs based on extension. PDFs are extracted with PyMuPDF, split into
+    page ranges and spread across a process pool; DOCX/TXT load in-process.
+    PDF pages keep PyPDFLoader-style metadata (source, page, page_label, total_pages).
+    """
     try:
-        for p in paths:
+        paths = [Path(p) for p in paths]
+        per_path: Dict[int, List[Document]] = {}
+        pdf_tasks: List[Tuple[int, Tuple[str, int, int]]] = []
+        for idx, p in enumerate(paths):
             ext = p.suffix.lower()
             if ext == ".pdf":
-                loader = PyPDFLoader(str(p))
+                pdf_tasks.extend((idx, t) for t in _pdf_tasks(p))
             elif ext == ".docx":
-                loader = Docx2txtLoader(str(p))
+                per_path[idx] = Docx2txtLoader(str(p)).load()
             elif ext == ".txt":
-                loader = TextLoader(str(p), encoding="utf-8")
+                per_path[idx] = TextLoader(str(p), encoding="utf-8").load()
             else:
                 log.warning("Unsupported extension skipped", path=str(p))
-                continue
-            docs.extend(loader.load())
-        log.info("Documents loaded", count=len(docs))
+
+        results = _run_pdf_tasks([t for _, t in pdf_tasks])
+        totals: Dict[int, int] = {}
+        for (idx, (_, _, stop)), _pages in zip(pdf_tasks, results):
+            totals[idx] = max(totals.get(idx, 0), stop)
+        for (idx, (src, _, _)), pages in zip(pdf_tasks, results):
+            per_path.setdefault(idx, []).extend(
+                Document(
+                    page_content=text,
+                    metadata={"source": src, "page": i, "page_label": str(i + 1), "total_pages": totals[idx]},
+                )
+                for i, text in pages
+            )
+
+        docs: List[Document] = [d for idx in sorted(per_path) for d in per_path[idx]]
+        log.info("Documents loaded", count=len(docs), files=len(paths), pdf_tasks=len(pdf_tasks))
         return docs
     except Exception as e:
         log.error("Failed loading documents", error=str(e))
@@ -60,10 +116,18 @@ def concat_for_comparison(ref_docs: List[Document], act_docs: List[Document]) ->
 
 # ---------- Helpers ----------
 class FastAPIFileAdapter:
-    """Adapt FastAPI UploadFile -> .name + .getbuffer() API"""
+    """Adapt FastAPI UploadFile -> .name + .size + .iter_chunks() (+ legacy .getbuffer()) API"""
     def __init__(self, uf: UploadFile):
         self._uf = uf
         self.name = uf.filename
+        self.size = uf.size
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        self._uf.file.seek(0)
+        while True:
+            chunk = self._uf.file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
     def getbuffer(self) -> bytes:
         self._uf.file.seek(0)
         return self._uf.file.read()
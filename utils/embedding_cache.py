@@ -0,0 +1,205 @@
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from utils.concurrency import run_blocking
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_CACHE_PATH = "embedding_cache/embeddings.sqlite3"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCacheStore:
+    """
+    SQLite-backed, content-addressed store of float32 vectors.
+
+    Rows are keyed by (namespace, sha256(text)); the namespace is the embedding
+    model name plus the embedding kind, since document and query vectors differ.
+    Least-recently-used rows are evicted once the stored vectors exceed max_bytes.
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        try:
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.max_bytes = max_bytes
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " namespace TEXT NOT NULL, digest BLOB NOT NULL, vec BLOB NOT NULL, last_used INTEGER NOT NULL,"
+                " PRIMARY KEY (namespace, digest)) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._total_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM embeddings"
+            ).fetchone()[0]
+        except Exception as e:
+            log.error("Failed to open embedding cache", error=str(e), path=str(path))
+            raise DocumentPortalException("Failed to open embedding cache", e) from e
+
+    def get_many(self, namespace: str, digests: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        if not digests:
+            return found
+        now = time.time_ns()
+        with self._lock:
+            # stay well under SQLite's host-parameter limit
+            for i in range(0, len(digests), 500):
+                batch = digests[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT digest, vec FROM embeddings WHERE namespace = ? AND digest IN ({marks})",
+                    [namespace, *batch],
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = array("f", blob).tolist()
+            if found:
+                # one transaction for all touches; autocommit would sync once per row
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE namespace = ? AND digest = ?",
+                        [(now, namespace, d) for d in found],
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        return found
+
+    def put_many(self, namespace: str, items: Dict[bytes, List[float]]):
+        if not items:
+            return
+        now = time.time_ns()
+        rows = [(namespace, d, array("f", vec).tobytes(), now) for d, vec in items.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (namespace, digest, vec, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+            self._total_bytes += sum(len(r[2]) for r in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # re-measure (other workers share the file), then drop LRU rows down to 90% of budget
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if self._total_bytes <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        cur = self._conn.execute("SELECT namespace, digest, LENGTH(vec) FROM embeddings ORDER BY last_used")
+        for namespace, digest, size in cur:
+            victims.append((namespace, digest))
+            freed += size
+            if self._total_bytes - freed <= target:
+                break
+        cur.close()
+        self._conn.execute("BEGIN")
+        self._conn.executemany("DELETE FROM embeddings WHERE namespace = ? AND digest = ?", victims)
+        self._conn.execute("COMMIT")
+        self._total_bytes -= freed
+        log.info("Embedding cache evicted", rows=len(victims), bytes_after=self._total_bytes,
+                 max_bytes=self.max_bytes)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingCacheStore
+    and only sends cache misses to the underlying model.
+    """
+    def __init__(self, underlying: Embeddings, store: EmbeddingCacheStore, model_name: str):
+        self.underlying = underlying
+        self.store = store
+        self.model_name = model_name
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _namespace(self, kind: str) -> str:
+        return f"{self.model_name}:{kind}"
+
+    def _lookup(self, kind: str, texts: List[str]):
+        digests = [text_digest(t) for t in texts]
+        found = self.store.get_many(self._namespace(kind), list(set(digests)))
+        # embed each distinct missing text once, even if it repeats in the batch
+        missing: Dict[bytes, str] = {}
+        for d, t in zip(digests, texts):
+            if d not in found and d not in missing:
+                missing[d] = t
+        with self._stats_lock:
+            self.misses += sum(1 for d in digests if d not in found)
+            self.hits += sum(1 for d in digests if d in found)
+        return digests, found, missing
+
+    def _store(self, kind: str, found, missing: Dict[bytes, str], vectors: List[List[float]]):
+        fresh = dict(zip(missing.keys(), vectors))
+        self.store.put_many(self._namespace(kind), fresh)
+        found.update(fresh)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests, found, missing = self._lookup("document", texts)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            self._store("document", found, missing, vectors)
+        return [found[d] for d in digests]
+
+    def embed_query(self, text: str) -> List[float]:
+        digests, found, missing = self._lookup("query", [text])
+        if missing:
+            self._store("query", found, missing, [self.underlying.embed_query(text)])
+        return found[digests[0]]
+
+    # the async variants run the SQLite lookups, writes and evictions on the blocking pool
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests, found, missing = await run_blocking(self._lookup, "document", texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            await run_blocking(self._store, "document", found, missing, vectors)
+        return [found[d] for d in digests]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        digests, found, missing = await run_blocking(self._lookup, "query", [text])
+        if missing:
+            vector = await self.underlying.aembed_query(text)
+            await run_blocking(self._store, "query", found, missing, [vector])
+        return found[digests[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes": self.store.total_bytes,
+                "max_bytes": self.store.max_bytes,
+            }
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+from utils.concurrency import run_blocking
+
+log = CustomLogger().get_logger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/second refill, up to `capacity` banked."""
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take `tokens` now (possibly going negative) and return how long to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1.0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeddings wrapper that splits documents into fixed-size batches, keeps at
+    most `max_concurrency` batches in flight, paces requests through a token
+    bucket and retries failed batches with exponential backoff + jitter.
+    """
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        requests_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        self.underlying = underlying
+        self.batch_size = max(1, int(batch_size))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # one budget for sync and async callers alike, on any event loop, so concurrent
+        # ingests together keep at most max_concurrency batches in flight
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed")
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.retries = 0
+        self.texts = 0
+
+    @classmethod
+    def from_config(cls, underlying: Embeddings, cfg: Optional[Dict[str, Any]]) -> "EmbeddingScheduler":
+        cfg = cfg or {}
+        return cls(
+            underlying,
+            batch_size=cfg.get("batch_size", 100),
+            max_concurrency=cfg.get("max_concurrency", 4),
+            requests_per_second=cfg.get("requests_per_second"),
+            burst=cfg.get("burst"),
+            max_retries=cfg.get("max_retries", 5),
+            backoff_base=cfg.get("backoff_base", 1.0),
+            backoff_max=cfg.get("backoff_max", 30.0),
+        )
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _delay(self, attempt: int) -> float:
+        return min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def _count(self, texts: int, retries: int):
+        with self._stats_lock:
+            self.batches += 1
+            self.texts += texts
+            self.retries += retries
+
+    # ---------- Sync ----------
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        with self._slots:
+            for attempt in range(self.max_retries + 1):
+                if self.bucket is not None:
+                    self.bucket.acquire()
+                try:
+                    vectors = self.underlying.embed_documents(batch)
+                    self._count(len(batch), attempt)
+                    return vectors
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        log.error("Embedding batch failed", size=len(batch), attempts=attempt + 1, error=str(e))
+                        raise DocumentPortalException("Embedding batch failed after retries", e) from e
+                    delay = self._delay(attempt)
+                    log.warning("Embedding batch failed; retrying", size=len(batch), attempt=attempt + 1,
+                                delay_s=round(delay, 2), error=str(e))
+                    time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = self._batches(list(texts))
+        if len(batches) <= 1:
+            return self._embed_batch(batches[0]) if batches else []
+        results = list(self._executor.map(self._embed_batch, batches))
+        return [v for batch in results for v in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.bucket is not None:
+            self.bucket.acquire()
+        return self.underlying.embed_query(text)
+
+    # ---------- Async ----------
+
+    async def _aacquire_slot(self):
+        if self._slots.acquire(blocking=False):
+            return
+        # wait on the blocking pool; if we are cancelled meanwhile, hand back the slot once it arrives
+        waiter = asyncio.ensure_future(run_blocking(self._slots.acquire))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            waiter.add_done_callback(
+                lambda f: None if f.cancelled() or f.exception() is not None else self._slots.release())
+            raise
+
+    async def _aembed_batch(self, batch: List[str]) -> List[List[float]]:
+        await self._aacquire_slot()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if self.bucket is not None:
+                    await self.bucket.aacquire()
+                try:
+                    vectors = await self.underlying.aembed_documents(batch)
+                    self._count(len(batch), attempt)
+                    return vectors
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        log.error("Embedding batch failed", size=len(batch), attempts=attempt + 1, error=str(e))
+                        raise DocumentPortalException("Embedding batch failed after retries", e) from e
+                    delay = self._delay(attempt)
+                    log.warning("Embedding batch failed; retrying", size=len(batch), attempt=attempt + 1,
+                                delay_s=round(delay, 2), error=str(e))
+                    await asyncio.sleep(delay)
+        finally:
+            self._slots.release()
+        raise AssertionError("unreachable")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        results = await asyncio.gather(*(self._aembed_batch(b) for b in self._batches(list(texts))))
+        return [v for batch in results for v in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.bucket is not None:
+            await self.bucket.aacquire()
+        return await self.underlying.aembed_query(text)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"batches": self.batches, "texts": self.texts, "retries": self.retries,
+                    "batch_size": self.batch_size, "max_concurrency": self.max_concurrency}
+
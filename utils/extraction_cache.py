@@ -0,0 +1,90 @@
+from __future__ import annotations
+import gzip
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.file_io import file_sha256
+from utils.pdf_extract import EXTRACTOR_VERSION, extract_pdf
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_CACHE_DIR = "extraction_cache"
+
+
+@dataclass
+class ExtractedPdf:
+    sha256: str
+    encrypted: bool
+    pages: List[str]
+
+
+class ExtractionCache:
+    """
+    On-disk cache of per-page PDF text keyed by (file sha256, extractor version).
+    Entries are gzipped JSON under <base_dir>/<sha[:2]>/, written atomically,
+    so repeated analyze/compare calls on the same bytes skip PyMuPDF.
+    """
+    def __init__(self, base_dir: str = DEFAULT_CACHE_DIR):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, sha256: str) -> Path:
+        return self.base_dir / sha256[:2] / f"{sha256}-{EXTRACTOR_VERSION}.json.gz"
+
+    def get(self, pdf_path: str | Path, sha256: Optional[str] = None) -> ExtractedPdf:
+        try:
+            sha256 = sha256 or file_sha256(Path(pdf_path))
+            entry = self._entry_path(sha256)
+            if entry.exists():
+                try:
+                    with gzip.open(entry, "rt", encoding="utf-8") as f:
+                        data = json.load(f)
+                    with self._lock:
+                        self.hits += 1
+                    return ExtractedPdf(sha256=sha256, encrypted=data["encrypted"], pages=data["pages"])
+                except (OSError, ValueError, KeyError) as e:
+                    log.warning("Corrupt extraction cache entry ignored", entry=str(entry), error=str(e))
+
+            encrypted, pages = extract_pdf(str(pdf_path))
+            with self._lock:
+                self.misses += 1
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmp = entry.with_name(f"{entry.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as f:
+                json.dump({"encrypted": encrypted, "pages": pages}, f, ensure_ascii=False)
+            os.replace(tmp, entry)
+            return ExtractedPdf(sha256=sha256, encrypted=encrypted, pages=pages)
+        except Exception as e:
+            log.error("PDF extraction failed", pdf_path=str(pdf_path), error=str(e))
+            raise DocumentPortalException(f"Could not extract PDF: {pdf_path}", e) from e
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache() -> ExtractionCache:
+    """Process-wide cache rooted at config.yaml `extraction_cache.path`."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from utils.model_loader import get_model_registry
+                cfg = get_model_registry().config.get("extraction_cache", {}) or {}
+                _cache = ExtractionCache(cfg.get("path", DEFAULT_CACHE_DIR))
+    return _cache
@@ -8,11 +8,23 @@ import shutil
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Iterable, List, Optional, Dict, Any
+from dataclasses import dataclass
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 log = CustomLogger().get_logger(__name__)
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+
+class UploadTooLargeError(ValueError):
+    """Upload exceeded MAX_UPLOAD_BYTES."""
+
+@dataclass
+class SavedUpload:
+    path: Path
+    size: int
+    sha256: str
 
 # ----------------------------- #
 # Helpers (file I/O + loading)  #
@@ -20,11 +32,70 @@ SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 def _session_id(prefix: str = "session") -> str:
     return f"{prefix}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
-def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path]:
-    """Save uploaded files (Streamlit-like) and return local paths."""
+def _iter_upload_chunks(uf, chunk_size: int) -> Iterable[bytes]:
+    """Yield an upload's bytes in chunks; supports .iter_chunks(), file-like .read() or .getbuffer()."""
+    if hasattr(uf, "iter_chunks"):
+        yield from uf.iter_chunks(chunk_size)
+    elif hasattr(uf, "read"):
+        if hasattr(uf, "seek"):
+            uf.seek(0)
+        while True:
+            chunk = uf.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        buf = memoryview(uf.getbuffer())
+        for i in range(0, len(buf), chunk_size):
+            yield buf[i:i + chunk_size]
+
+def stream_upload_to_file(
+    uf,
+    out: Path,
+    *,
+    max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SavedUpload:
+    """
+    Copy an upload to `out` in fixed-size chunks, hashing and sizing on the fly.
+    Memory stays at one chunk per upload; uploads over max_bytes are rejected
+    (before reading when the size is declared) and the partial file removed.
+    """
+    name = getattr(uf, "name", "file")
+    declared = getattr(uf, "size", None)
+    if max_bytes is not None and declared is not None and declared > max_bytes:
+        raise UploadTooLargeError(f"{name} is {declared} bytes; limit is {max_bytes}")
+
+    out = Path(out)
+    tmp = out.with_name(out.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in _iter_upload_chunks(uf, chunk_size):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLargeError(f"{name} exceeds upload limit of {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(tmp, out)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return SavedUpload(path=out, size=size, sha256=digest.hexdigest())
+
+def file_sha256(path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_uploads(uploaded_files: Iterable, target_dir: Path) -> List[SavedUpload]:
+    """Save uploaded files (Streamlit-like) and return path + size + sha256 for each."""
     try:
         target_dir.mkdir(parents=True, exist_ok=True)
-        saved: List[Path] = []
+        saved: List[SavedUpload] = []
         for uf in uploaded_files:
             name = getattr(uf, "name", "file")
             ext = Path(name).suffix.lower()
@@ -33,14 +104,14 @@ def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path
                 continue
             fname = f"{uuid.uuid4().hex[:8]}{ext}"
             out = target_dir / fname
-            with open(out, "wb") as f:
-                if hasattr(uf, "read"):
-                    f.write(uf.read())
-                else:
-                    f.write(uf.getbuffer())  # fallback
-            saved.append(out)
-            log.info("File saved for ingestion", uploaded=name, saved_as=str(out))
+            info = stream_upload_to_file(uf, out)
+            saved.append(info)
+            log.info("File saved for ingestion", uploaded=name, saved_as=str(out), size=info.size, sha256=info.sha256)
         return saved
     except Exception as e:
         log.error("Failed to save uploaded files", error=str(e), dir=str(target_dir))
-        raise DocumentPortalException("Failed to save uploaded files", e) from e
\ No newline at end of file
+        raise DocumentPortalException("Failed to save uploaded files", e) from e
+
+def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path]:
+    """Save uploaded files (Streamlit-like) and return local paths."""
+    return [info.path for info in save_uploads(uploaded_files, target_dir)]
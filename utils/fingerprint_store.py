@@ -0,0 +1,66 @@
+from __future__ import annotations
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Set
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+_PARAM_BATCH = 500  # keys per IN (...) query, well under SQLite's host-parameter limit
+
+
+class FingerprintStore:
+    """
+    SQLite set of ingested chunk fingerprints for one index directory.
+
+    Membership checks and bulk inserts hit the primary-key B-tree directly, so
+    opening the store costs O(1) regardless of how many keys it holds.
+    """
+    def __init__(self, path: Path):
+        try:
+            self.path = Path(path)
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS fingerprints (key TEXT PRIMARY KEY) WITHOUT ROWID")
+        except Exception as e:
+            log.error("Failed to open fingerprint store", error=str(e), path=str(path))
+            raise DocumentPortalException("Failed to open fingerprint store", e) from e
+
+    def contains_many(self, keys: Iterable[str]) -> Set[str]:
+        """Return the subset of `keys` already present."""
+        keys = list(keys)
+        found: Set[str] = set()
+        with self._lock:
+            for i in range(0, len(keys), _PARAM_BATCH):
+                batch = keys[i:i + _PARAM_BATCH]
+                marks = ",".join("?" * len(batch))
+                found.update(k for (k,) in self._conn.execute(
+                    f"SELECT key FROM fingerprints WHERE key IN ({marks})", batch
+                ))
+        return found
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self.contains_many([key]))
+
+    def add_many(self, keys: Iterable[str]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR IGNORE INTO fingerprints (key) VALUES (?)", ((k,) for k in keys))
+            self._conn.execute("COMMIT")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM fingerprints")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
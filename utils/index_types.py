@@ -0,0 +1,116 @@
+"""
+Vector index types selectable per index in config.yaml `faiss_db.index.<profile>`.
+
+    type: flat | hnsw | ivf_flat | ivf_pq | sq8 | fp16
+    hnsw_m, ef_construction, ef_search      (hnsw)
+    nlist, nprobe                           (ivf_*; nlist defaults to ~4*sqrt(n) of the training batch)
+    pq_m, pq_nbits                          (ivf_pq; pq_m is lowered to a divisor of the dimension)
+    min_train_vectors                       (trainable types stay flat until a batch this large is seen)
+
+Trainable types (ivf_*, sq8) are trained on the first batch written to an index.
+If that batch is too small the index starts as exact flat and is rebuilt as the
+configured type when segment compaction has gathered enough vectors.
+"""
+from __future__ import annotations
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "fp16")
+FLAT_FACTORY = "Flat"
+DEFAULT_MIN_TRAIN_VECTORS = 1000
+_POINTS_PER_CENTROID = 39  # FAISS k-means warns below this many training points per centroid
+
+
+def index_spec(config: Dict[str, Any], profile: str) -> Dict[str, Any]:
+    """The `faiss_db.index.<profile>` block, defaulting to exact flat search."""
+    spec = dict(((config.get("faiss_db", {}) or {}).get("index", {}) or {}).get(profile) or {})
+    spec.setdefault("type", "flat")
+    if spec["type"] not in INDEX_TYPES:
+        raise DocumentPortalException(
+            f"Unknown faiss_db.index.{profile}.type {spec['type']!r}; expected one of {', '.join(INDEX_TYPES)}"
+        )
+    return spec
+
+
+def _pq_m(dim: int, wanted: int) -> int:
+    return max(m for m in range(1, min(wanted, dim) + 1) if dim % m == 0)
+
+
+def factory_string(spec: Dict[str, Any], n: int, dim: int) -> str:
+    """faiss.index_factory string for spec given n training vectors; Flat when n is too small to train."""
+    kind = spec.get("type", "flat")
+    if kind == "flat":
+        return FLAT_FACTORY
+    if kind == "hnsw":
+        return f"HNSW{int(spec.get('hnsw_m', 32))},Flat"
+    if kind == "fp16":
+        return "SQfp16"
+    if n < int(spec.get("min_train_vectors", DEFAULT_MIN_TRAIN_VECTORS)):
+        return FLAT_FACTORY
+    if kind == "sq8":
+        return "SQ8"
+    nlist = int(spec.get("nlist") or max(1, min(4 * int(math.sqrt(n)), n // _POINTS_PER_CENTROID)))
+    needed = nlist * _POINTS_PER_CENTROID
+    if kind == "ivf_pq":
+        nbits = int(spec.get("pq_nbits", 8))
+        needed = max(needed, (2 ** nbits) * _POINTS_PER_CENTROID)
+        coarse = f"IVF{nlist},PQ{_pq_m(dim, int(spec.get('pq_m', 16)))}x{nbits}"
+    else:
+        coarse = f"IVF{nlist},Flat"
+    return coarse if n >= needed else FLAT_FACTORY
+
+
+def build_index(spec: Dict[str, Any], vectors: np.ndarray) -> Tuple[Any, str]:
+    """Empty index of the configured type, trained on `vectors` if it needs training."""
+    n, dim = vectors.shape
+    factory = factory_string(spec, n, dim)
+    if factory == FLAT_FACTORY and spec.get("type", "flat") != "flat":
+        log.info("Training batch too small; starting with a flat index", type=spec["type"], vectors=n)
+    index = faiss.index_factory(dim, factory)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = int(spec.get("ef_construction", 40))
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index, factory
+
+
+def finalize_index(index: Any):
+    """Call after adding vectors: IVF indexes keep a direct map so stored vectors can be reconstructed (MMR)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+
+
+def apply_search_params(index: Any, spec: Optional[Dict[str, Any]]):
+    spec = spec or {}
+    params = faiss.ParameterSpace()
+    if faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, "nprobe", int(spec.get("nprobe", 16)))
+    elif isinstance(index, faiss.IndexHNSW):
+        params.set_index_parameter(index, "efSearch", int(spec.get("ef_search", 64)))
+
+
+def merge_into(dst: Any, src: Any):
+    """Append src's vectors to dst (row ids continue after dst's)."""
+    dst_ivf, src_ivf = faiss.try_extract_index_ivf(dst), faiss.try_extract_index_ivf(src)
+    try:
+        if dst_ivf is not None and src_ivf is not None:
+            # IVF merge needs the direct maps off; ids are shifted by dst.ntotal
+            dst_ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+            src_ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+            dst.merge_from(src, dst.ntotal)
+        else:
+            dst.merge_from(src, 0)
+    except RuntimeError:
+        # different types (e.g. a flat segment into an upgraded base) or no merge_from (HNSW)
+        finalize_index(src)
+        dst.add(src.reconstruct_n(0, src.ntotal))
+    finalize_index(dst)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+
+class JobStore:
+    """
+    SQLite table of background job records, shared by every worker process that
+    opens the same file, so a job can be polled from any of them.
+
+    Each record is a JSON document plus the columns needed to look it up: its
+    status, an optional dedupe key and when it was last written. claim() checks
+    for an active job with the same dedupe key and inserts the new one in one
+    write transaction, so two workers never start the same job twice.
+    """
+    def __init__(self, path: Path, retention: int = 1000):
+        try:
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.retention = retention
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None,
+                                         timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, dedupe_key TEXT, status TEXT NOT NULL,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+        except Exception as e:
+            log.error("Failed to open job store", error=str(e), path=str(path))
+            raise DocumentPortalException("Failed to open job store", e) from e
+
+    def _active(self, dedupe_key: str, states: Iterable[str], stale_after_s: float) -> Optional[Dict[str, Any]]:
+        states = list(states)
+        marks = ",".join("?" * len(states))
+        row = self._conn.execute(
+            f"SELECT data FROM jobs WHERE dedupe_key = ? AND status IN ({marks}) AND updated_at >= ?"
+            " ORDER BY created_at DESC LIMIT 1",
+            [dedupe_key, *states, time.time() - stale_after_s],
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def active(self, dedupe_key: Optional[str], states: Iterable[str],
+               stale_after_s: float) -> Optional[Dict[str, Any]]:
+        """Newest job with this key in one of `states`, ignoring any not written for stale_after_s."""
+        if dedupe_key is None:
+            return None
+        with self._lock:
+            return self._active(dedupe_key, states, stale_after_s)
+
+    def claim(self, job_id: str, dedupe_key: Optional[str], status: str, data: Dict[str, Any],
+              active_states: Iterable[str], terminal_states: Iterable[str],
+              stale_after_s: float) -> Tuple[Dict[str, Any], bool]:
+        """Insert a job unless an active one has the same key; returns (record, merged_into_existing)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._active(dedupe_key, active_states, stale_after_s) if dedupe_key else None
+                if existing is None:
+                    self._conn.execute(
+                        "INSERT INTO jobs (job_id, dedupe_key, status, created_at, updated_at, data)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (job_id, dedupe_key, status, now, now, json.dumps(data)),
+                    )
+                    self._trim(terminal_states)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return (existing, True) if existing is not None else (data, False)
+
+    def _trim(self, terminal_states: Iterable[str]):
+        # forget the oldest finished jobs beyond the retention limit
+        states = list(terminal_states)
+        marks = ",".join("?" * len(states))
+        self._conn.execute(
+            f"DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status IN ({marks})"
+            " ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            [*states, self.retention],
+        )
+
+    def save(self, job_id: str, status: str, data: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE job_id = ?",
+                               (status, time.time(), json.dumps(data), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,9 +1,13 @@
 import os
 import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
 from dotenv import load_dotenv
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
-from utils.config_loader import load_config
+from utils.config_loader import load_config, resolve_config_path
+from utils.embedding_cache import CachedEmbeddings, EmbeddingCacheStore, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from utils.embedding_scheduler import EmbeddingScheduler
 from langchain_groq import ChatGroq
 from logger.custom_logger import CustomLogger
 # from langchain_openai import ChatOpenAI
@@ -11,44 +15,104 @@ from exception.custom_exception import DocumentPortalException
 
 log = CustomLogger().get_logger(__name__)
 
-class ModelLoader:
-    def __init__(self):
-        load_dotenv()
-        self._validate_environment()
-        self.config=load_config()
-        log.info("Environment variables loaded successfully.",config_keys=list(self.config.keys()))
+REQUIRED_ENV_VARS = ["GOOGLE_API_KEY", "GROQ_API_KEY"]
+MAX_TOKEN_LIMIT = 6000
 
 
-    def _validate_environment(self):
-        """Validate that all required environment variables are set."""
-        required_vars = [
-            "GOOGLE_API_KEY",
-            "GROQ_API_KEY"]
-        self.api_keys = {key:os.getenv(key) for key in required_vars}
-        missing = [k for k, v in self.api_keys.items() if not v]
-        if missing:
-            log.error(f"Missing environment variables",missing_vars=missing)
-            raise DocumentPortalException("Missing environment variables",sys)
-        log.info("All required environment variables are set.",api_keys=list(self.api_keys.keys()))
-        
+class ModelRegistry:
+    """
+    Process-wide, thread-safe registry of config + model clients.
+
+    Config is parsed once and re-read only when config.yaml changes on disk.
+    One client is kept per (provider, model, settings) so every request reuses
+    the same warm HTTP connections instead of building fresh clients.
+    """
+    def __init__(self, config_path: Optional[str] = None):
+        self._config_path = config_path
+        self._lock = threading.RLock()
+        self._config: Dict[str, Any] = {}
+        self._config_stamp: Optional[Tuple[str, int, int]] = None
+        self._clients: Dict[Tuple[Any, ...], Any] = {}
+        load_dotenv()
 
-    def load_embeddings(self):
+    # ---------- Config ----------
+
+    def _stamp(self) -> Tuple[str, int, int]:
+        path = resolve_config_path(self._config_path)
         try:
-            log.info("Loading Google Generative AI embeddings.")
-            model_name=self.config["embedding_model"]["model_name"]
-            return GoogleGenerativeAIEmbeddings(model=model_name)
-        except Exception as e:
-            log.error("Failed to load Google Generative AI embeddings.", error=str(e))
-            raise DocumentPortalException("Failed to load Google Generative AI embeddings", sys)
-        
-        
+            st = path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Config file not found: {path}")
+        return (str(path), st.st_mtime_ns, st.st_size)
 
-    def load_llm(self):
-        llm_block = self.config["llm"]
-        log.info("Loading LLM configuration.")
-        
-        provider_key = os.getenv("LLM_PROVIDER", "google")
+    @property
+    def config(self) -> Dict[str, Any]:
+        stamp = self._stamp()
+        if stamp == self._config_stamp:
+            return self._config
+        with self._lock:
+            if stamp != self._config_stamp:
+                reloaded = self._config_stamp is not None
+                self._config = load_config(stamp[0])
+                self._config_stamp = stamp
+                if reloaded:
+                    # settings may have changed under existing keys; rebuild lazily
+                    self._clients.clear()
+                    log.info("Config changed on disk; model clients reset", config_path=stamp[0])
+                else:
+                    log.info("Config loaded", config_path=stamp[0], config_keys=list(self._config.keys()))
+            return self._config
+
+    # ---------- Clients ----------
+
+    def _get_or_create(self, key: Tuple[Any, ...], factory):
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+                log.info("Model client created", key=[str(k) for k in key])
+            return client
+
+    def get_embeddings(self, cached: Optional[bool] = None):
+        """
+        Shared embeddings client behind the batching/rate-limiting EmbeddingScheduler,
+        wrapped in the persistent embedding cache when `cached`
+        (default: config.yaml `embedding_cache.enabled`) is true.
+        """
+        config = self.config
+        model_name = config["embedding_model"]["model_name"]
+        client = self._get_or_create(
+            ("embeddings", "google", model_name),
+            lambda: GoogleGenerativeAIEmbeddings(model=model_name),
+        )
+        sched_cfg = config.get("embedding_scheduler", {}) or {}
+        base = self._get_or_create(
+            ("embeddings_scheduled", "google", model_name),
+            lambda: EmbeddingScheduler.from_config(client, sched_cfg),
+        )
+        cache_cfg = config.get("embedding_cache", {}) or {}
+        if cached is None:
+            cached = bool(cache_cfg.get("enabled", False))
+        if not cached:
+            return base
 
+        path = str(cache_cfg.get("path", DEFAULT_CACHE_PATH))
+        max_bytes = int(cache_cfg.get("max_bytes", DEFAULT_MAX_BYTES))
+        store = self._get_or_create(
+            ("embedding_store", path, max_bytes),
+            lambda: EmbeddingCacheStore(path, max_bytes=max_bytes),
+        )
+        return self._get_or_create(
+            ("embeddings_cached", "google", model_name, path),
+            lambda: CachedEmbeddings(base, store, model_name),
+        )
+
+    def get_llm(self, provider_key: str):
+        llm_block = self.config["llm"]
         if provider_key not in llm_block:
             log.error(f"LLM provider '{provider_key}' not found in configuration.", provider=provider_key)
             raise DocumentPortalException(f"LLM provider '{provider_key}' not found in configuration", sys)
@@ -56,32 +120,91 @@ class ModelLoader:
         llm_config = llm_block[provider_key]
         provider = llm_config.get("provider")
         model_name = llm_config.get("model_name")
-        temperature = llm_config.get("temperature",0.2)
-        max_tokens = llm_config.get("max_tokens",2048)
-        MAX_TOKEN_LIMIT = 6000
+        temperature = llm_config.get("temperature", 0.2)
+        max_tokens = llm_config.get("max_tokens", 2048)
         if max_tokens > MAX_TOKEN_LIMIT:
-            log.warning(f"max_tokens {max_tokens} exceeds limit for model; capping to {MAX_TOKEN_LIMIT}", 
+            log.warning(f"max_tokens {max_tokens} exceeds limit for model; capping to {MAX_TOKEN_LIMIT}",
                 extra={"requested": max_tokens, "capped": MAX_TOKEN_LIMIT})
-            max_tokens = MAX_TOKEN_LIMIT        
-        log.info("LLM configuration loaded.", provider=provider, model_name=model_name,temperature=temperature, max_tokens=max_tokens)
-        
+            max_tokens = MAX_TOKEN_LIMIT
+
         if provider == "google":
-            return ChatGoogleGenerativeAI(
+            factory = lambda: ChatGoogleGenerativeAI(
                 model=model_name,
                 temperature=temperature,
                 max_output_tokens=max_tokens,
-                api_key=self.api_keys["GOOGLE_API_KEY"]
+                api_key=os.getenv("GOOGLE_API_KEY"),
             )
         elif provider == "groq":
-            return ChatGroq(
+            factory = lambda: ChatGroq(
                 model=model_name,
                 temperature=temperature,
                 max_tokens=max_tokens,
-                api_key=self.api_keys["GROQ_API_KEY"]
+                api_key=os.getenv("GROQ_API_KEY"),
             )
         else:
             log.error(f"Unsupported LLM provider: {provider}", provider=provider)
-            raise DocumentPortalException(f"Unsupported LLM provider: {provider}", sys)     
+            raise DocumentPortalException(f"Unsupported LLM provider: {provider}", sys)
+
+        return self._get_or_create(("llm", provider, model_name, temperature, max_tokens), factory)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._config_stamp = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._clients)
+        return {"clients": [list(map(str, k)) for k in keys]}
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide ModelRegistry (created on first use)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+class ModelLoader:
+    """
+    Thin facade over the process-wide ModelRegistry.
+    Cheap to construct; all instances share config and clients.
+    """
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or get_model_registry()
+        self._validate_environment()
+
+    @property
+    def config(self):
+        return self.registry.config
+
+    def _validate_environment(self):
+        """Validate that all required environment variables are set."""
+        self.api_keys = {key:os.getenv(key) for key in REQUIRED_ENV_VARS}
+        missing = [k for k, v in self.api_keys.items() if not v]
+        if missing:
+            log.error(f"Missing environment variables",missing_vars=missing)
+            raise DocumentPortalException("Missing environment variables",sys)
+
+
+    def load_embeddings(self, cached: Optional[bool] = None):
+        try:
+            return self.registry.get_embeddings(cached=cached)
+        except Exception as e:
+            log.error("Failed to load Google Generative AI embeddings.", error=str(e))
+            raise DocumentPortalException("Failed to load Google Generative AI embeddings", sys)
+
+
+
+    def load_llm(self):
+        provider_key = os.getenv("LLM_PROVIDER", "google")
+        return self.registry.get_llm(provider_key)
 
 if __name__ == "__main__":
     loader = ModelLoader()
@@ -91,7 +214,7 @@ if __name__ == "__main__":
 
     llm = loader.load_llm()
     print("LLM loaded successfully:", llm)
+    print("Same client on second load:", llm is ModelLoader().load_llm())
 
     result = llm.invoke("Hello, how are you?")
     print("LLM response:", result.content)
-        
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Lightweight PyMuPDF helpers meant to run inside worker processes.
+Keep imports minimal: pool workers import only this module.
+"""
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+
+# bump when extraction output changes so cached page text is not reused
+EXTRACTOR_VERSION = f"pymupdf-{fitz.VersionBind}-1"
+
+
+def pdf_page_count(path: str) -> int:
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def extract_pdf(path: str) -> Tuple[bool, List[str]]:
+    """Return (is_encrypted, [text of each page])."""
+    with fitz.open(path) as doc:
+        if doc.is_encrypted:
+            return True, []
+        return False, [doc.load_page(i).get_text() for i in range(doc.page_count)]  # type: ignore
+
+
+def extract_pdf_pages(path: str, start: int = 0, stop: int = -1) -> List[Tuple[int, str]]:
+    """Return [(page_index, text), ...] for pages [start, stop); stop=-1 means to the end."""
+    with fitz.open(path) as doc:
+        stop = doc.page_count if stop < 0 else min(stop, doc.page_count)
+        return [(i, doc.load_page(i).get_text()) for i in range(start, stop)]  # type: ignore
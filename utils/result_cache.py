@@ -0,0 +1,178 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_CACHE_DIR = "result_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def prompt_version(*prompts: Any) -> str:
+    """Short digest of prompt templates, so editing a prompt retires results produced with it."""
+    digest = hashlib.sha256()
+    for prompt in prompts:
+        digest.update(prompt.pretty_repr().encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def model_id(llm: Any) -> str:
+    name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return f"{type(llm).__name__}:{name}"
+
+
+class ResultCache:
+    """
+    On-disk cache of JSON-serializable LLM results keyed by a dict of key parts
+    (content hashes, model, prompt version...). Entries are gzipped JSON under
+    <base_dir>/<tag[:2]>/<tag>-<key>.json.gz, written atomically, so a result
+    computed once for the same inputs is returned without re-running the pipeline.
+
+    The tag (by default the key itself) is usually the input file's sha256, so
+    invalidate(tag) drops every result for that file. A hit touches the entry's
+    mtime; once the entries exceed max_bytes the least recently used are removed
+    until the cache is back under 90% of the limit.
+    """
+    def __init__(self, base_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._total_bytes = sum(p.stat().st_size for p in self._entries())
+
+    @staticmethod
+    def key(parts: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, parts: Dict[str, Any], tag: Optional[str]) -> Path:
+        key = self.key(parts)
+        tag = tag or key
+        return self.base_dir / tag[:2] / f"{tag}-{key[:32]}.json.gz"
+
+    def _entries(self) -> List[Path]:
+        return list(self.base_dir.glob("*/*.json.gz"))
+
+    def get(self, parts: Dict[str, Any], tag: Optional[str] = None) -> Optional[Any]:
+        entry = self._entry_path(parts, tag)
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+            os.utime(entry)  # recency for LRU eviction
+        except FileNotFoundError:
+            value = None
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("Corrupt result cache entry ignored", entry=str(entry), error=str(e))
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, parts: Dict[str, Any], value: Any, tag: Optional[str] = None):
+        try:
+            entry = self._entry_path(parts, tag)
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmp = entry.with_name(f"{entry.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as f:
+                json.dump({"key": parts, "created": time.time(), "value": value}, f, ensure_ascii=False)
+            size = tmp.stat().st_size
+            try:
+                replaced = entry.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, entry)
+        except OSError as e:
+            # the result is still returned; only reuse is lost
+            log.warning("Failed to write result cache entry", error=str(e), base_dir=str(self.base_dir))
+            return
+        with self._lock:
+            self._total_bytes += size - replaced
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for p in self._entries():
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+            for _, size, p in sorted(entries):
+                if total <= target:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                self.evictions += 1
+            self._total_bytes = total
+        log.info("Result cache evicted", base_dir=str(self.base_dir), bytes=total)
+
+    def invalidate(self, tag: Optional[str] = None) -> int:
+        """Remove every entry for tag (e.g. a file sha256), or all entries; returns how many."""
+        pattern = f"{tag[:2]}/{tag}-*.json.gz" if tag else "*/*.json.gz"
+        removed = 0
+        with self._lock:
+            for p in self.base_dir.glob(pattern):
+                try:
+                    size = p.stat().st_size
+                    p.unlink()
+                except FileNotFoundError:
+                    continue
+                self._total_bytes -= size
+                removed += 1
+            self.invalidations += removed
+        log.info("Result cache invalidated", base_dir=str(self.base_dir), tag=tag, entries=removed)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+RESULT_CACHES = ("analyze", "compare")
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+def get_result_cache(name: str) -> ResultCache:
+    """Process-wide cache for one endpoint, from config.yaml `result_cache.<name>` (path, max_bytes)."""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                from utils.model_loader import get_model_registry
+                cfg = ((get_model_registry().config.get("result_cache", {}) or {}).get(name) or {})
+                cache = _caches[name] = ResultCache(
+                    cfg.get("path", os.path.join(DEFAULT_CACHE_DIR, name)),
+                    max_bytes=int(cfg.get("max_bytes", DEFAULT_MAX_BYTES)),
+                )
+    return cache
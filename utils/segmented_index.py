@@ -0,0 +1,588 @@
+from __future__ import annotations
+import json
+import os
+import pickle
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy, maximal_marginal_relevance
+
+from utils.index_types import FLAT_FACTORY, apply_search_params, build_index, finalize_index, merge_into
+from utils.concurrency import run_blocking
+from utils.compact_docstore import CompactDocstore, docstore_paths, faiss_rows, has_docstore, write_docstore
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks below are process-local only
+    fcntl = None
+
+log = CustomLogger().get_logger(__name__)
+
+MANIFEST_NAME = "segments.json"
+SEGMENTS_DIR = "segments"
+LOCK_NAME = ".lock"
+COMPACT_LOCK_NAME = ".compact.lock"
+DEFAULT_MAX_SEGMENTS = 8
+
+
+class DirLock:
+    """
+    Reentrant lock on one index directory, across threads and processes: a
+    thread RLock, plus an exclusive flock on index_dir/.lock held while the
+    outermost holder is inside. flock conflicts between open files even within
+    one process, so only the first acquisition by a thread takes it.
+    """
+    def __init__(self, index_dir: str):
+        self.path = Path(index_dir) / LOCK_NAME
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "DirLock":
+        self._rlock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None and self.path.parent.is_dir():
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+            self._depth += 1
+        except BaseException:
+            self._rlock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc: Any):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fd, self._fd = self._fd, None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._rlock.release()
+
+
+_dir_locks: Dict[str, DirLock] = {}
+_dir_locks_guard = threading.Lock()
+
+
+def dir_lock(index_dir: Union[str, Path]) -> DirLock:
+    """
+    Per-directory lock serializing manifest updates, base swaps and loads across
+    this process's threads and every other worker process using the directory.
+    """
+    key = os.path.abspath(index_dir)
+    with _dir_locks_guard:
+        lock = _dir_locks.get(key)
+        if lock is None:
+            lock = _dir_locks[key] = DirLock(key)
+        return lock
+
+
+@contextmanager
+def _compaction_slot(index_dir: Path):
+    """Non-blocking flock on index_dir/.compact.lock; yields False while another process compacts this dir."""
+    if fcntl is None:
+        yield True
+        return
+    fd = os.open(index_dir / COMPACT_LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+# ---------- Manifest ----------
+
+def read_manifest(index_dir: Union[str, Path]) -> Dict[str, Any]:
+    """
+    {"version", "next_id", "segments": [names...], "index_spec", "index_factory"};
+    an absent manifest means a flat base only.
+    """
+    try:
+        raw = json.loads((Path(index_dir) / MANIFEST_NAME).read_text(encoding="utf-8")) or {}
+    except FileNotFoundError:
+        raw = {}
+    return {
+        "version": int(raw.get("version", 0)),
+        "next_id": int(raw.get("next_id", 1)),
+        "segments": list(raw.get("segments", [])),
+        "index_spec": dict(raw.get("index_spec") or {"type": "flat"}),
+        "index_factory": raw.get("index_factory", FLAT_FACTORY),
+    }
+
+
+def _write_manifest(index_dir: Path, manifest: Dict[str, Any]):
+    path = index_dir / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def index_version(index_dir: Union[str, Path]) -> int:
+    """Monotonic counter bumped whenever the searchable contents of index_dir change."""
+    return read_manifest(index_dir)["version"]
+
+
+def part_files(folder: Union[str, Path], name: str) -> List[Path]:
+    """Every file a part may have on disk: vectors, compact docstore, legacy pickle."""
+    folder = Path(folder)
+    return [folder / f"{name}.faiss", *docstore_paths(folder, name), folder / f"{name}.pkl"]
+
+
+def segment_files(index_dir: Union[str, Path], manifest: Optional[Dict[str, Any]] = None) -> List[Path]:
+    manifest = manifest or read_manifest(index_dir)
+    seg_dir = Path(index_dir) / SEGMENTS_DIR
+    return [p for name in manifest["segments"] for p in part_files(seg_dir, name)]
+
+
+def part_exists(folder: Union[str, Path], name: str) -> bool:
+    folder = Path(folder)
+    return (folder / f"{name}.faiss").exists() and (
+        has_docstore(folder, name) or (folder / f"{name}.pkl").exists()
+    )
+
+
+def _install_part(folder: Path, tmp_name: str, name: str):
+    """
+    Rename a part written under tmp_name into place: docstore first, header and
+    vectors last. Renames leave readers that memory-mapped the old files intact.
+    """
+    for src, dst in zip(docstore_paths(folder, tmp_name), docstore_paths(folder, name)):
+        os.replace(src, dst)
+    os.replace(folder / f"{tmp_name}.faiss", folder / f"{name}.faiss")
+    (folder / f"{name}.pkl").unlink(missing_ok=True)
+
+
+def save_part(vs: FAISS, folder: Union[str, Path], name: str):
+    """Write vectors + compact docstore under a temporary name, then install them as `name`."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp_name = f"{name}.tmp"
+    write_docstore(folder, tmp_name, faiss_rows(vs))
+    faiss.write_index(vs.index, str(folder / f"{tmp_name}.faiss"))
+    _install_part(folder, tmp_name, name)
+
+
+# ---------- Writes ----------
+
+def _template_path(index_dir: Path, index_name: str) -> Path:
+    return index_dir / f"{index_name}.template.faiss"
+
+
+def _write_template(index_dir: Path, index_name: str, template: Any):
+    path = _template_path(index_dir, index_name)
+    tmp = path.with_name(path.name + ".tmp")
+    faiss.write_index(template, str(tmp))
+    os.replace(tmp, path)
+
+
+def segment_template(index_dir: Union[str, Path], dim: int, index_name: str = "index") -> Any:
+    """Empty index for a new segment: a copy of the base's trained (reset) index, or flat."""
+    path = _template_path(Path(index_dir), index_name)
+    return faiss.read_index(str(path)) if path.exists() else faiss.IndexFlatL2(dim)
+
+
+def write_base(
+    index_dir: Union[str, Path], vs: FAISS, index_name: str = "index", *,
+    template: Any = None, spec: Optional[Dict[str, Any]] = None, factory: str = FLAT_FACTORY,
+):
+    """
+    Persist vs as the whole index, dropping any delta segments. `template` is the
+    empty trained index new segments start from; `spec`/`factory` record the
+    configured and the actually built index type.
+    """
+    index_dir = Path(index_dir)
+    with dir_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        save_part(vs, index_dir, index_name)
+        if template is not None:
+            _write_template(index_dir, index_name, template)
+        else:
+            _template_path(index_dir, index_name).unlink(missing_ok=True)
+        shutil.rmtree(index_dir / SEGMENTS_DIR, ignore_errors=True)
+        _write_manifest(index_dir, {"version": manifest["version"] + 1, "next_id": manifest["next_id"],
+                                    "segments": [], "index_spec": spec or {"type": "flat"},
+                                    "index_factory": factory})
+
+
+def append_segment(index_dir: Union[str, Path], vs: FAISS) -> Dict[str, Any]:
+    """
+    Persist vs as a new delta segment next to the base. Only the new vectors and
+    their docstore are written; the segment becomes visible once the manifest lists it.
+    """
+    index_dir = Path(index_dir)
+    seg_dir = index_dir / SEGMENTS_DIR
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    with dir_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        name = f"seg-{manifest['next_id']:06d}"
+        save_part(vs, seg_dir, name)
+        manifest["segments"].append(name)
+        manifest["next_id"] += 1
+        manifest["version"] += 1
+        _write_manifest(index_dir, manifest)
+    return manifest
+
+
+# ---------- Reads ----------
+
+def _mmap_default() -> bool:
+    from utils.model_loader import get_model_registry
+    return bool((get_model_registry().config.get("faiss_db", {}) or {}).get("mmap", False))
+
+
+def read_index(path: Union[str, Path], mmap: bool = False) -> Any:
+    """
+    faiss.read_index, optionally memory-mapped read-only so the OS page cache
+    shares the vectors across workers. Flat-code indexes (flat, SQ) map their
+    code array (IO_FLAG_MMAP_IFC); IVF indexes map their inverted lists
+    (IO_FLAG_MMAP). Index types that support neither are read into memory.
+    """
+    path = str(path)
+    if not mmap:
+        return faiss.read_index(path)
+    with open(path, "rb") as f:
+        fourcc = f.read(4)
+    flag = faiss.IO_FLAG_MMAP if fourcc.startswith(b"Iw") else faiss.IO_FLAG_MMAP_IFC
+    try:
+        return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        log.warning("Index type cannot be memory-mapped; reading into memory", path=path,
+                    fourcc=fourcc.decode("latin-1"), error=str(e).splitlines()[0])
+        return faiss.read_index(path)
+
+
+def load_part(folder: Path, embeddings: Embeddings, name: str, mmap: bool = False,
+              spec: Optional[Dict[str, Any]] = None) -> FAISS:
+    """
+    Open one part. Compact docstores are memory-mapped and only materialize the
+    rows a search returns; parts still in the pickled layout (not yet converted
+    with `python -m utils.compact_docstore`) unpickle their docstore. With
+    mmap=True the vectors are mapped read-only too (see read_index).
+    """
+    folder = Path(folder)
+    index = read_index(folder / f"{name}.faiss", mmap=mmap)
+    apply_search_params(index, spec)
+    if has_docstore(folder, name):
+        docstore = CompactDocstore(folder, name)
+        return FAISS(embeddings, index, docstore, docstore.id_map())
+    log.warning("Loading pickled docstore; convert with `python -m utils.compact_docstore`",
+                folder=str(folder), name=name)
+    with open(folder / f"{name}.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)  # trusted: written by this app's FAISS.save_local
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def load_segmented(
+    index_dir: Union[str, Path], embeddings: Embeddings, index_name: str = "index", mmap: Optional[bool] = None,
+) -> "SegmentedVectorStore":
+    """
+    Load the base index plus every delta segment listed in the manifest.
+    mmap defaults to config.yaml `faiss_db.mmap`.
+    """
+    index_dir = Path(index_dir)
+    mmap = _mmap_default() if mmap is None else mmap
+    try:
+        with dir_lock(index_dir):
+            manifest = read_manifest(index_dir)
+            spec = manifest["index_spec"]
+            parts = [load_part(index_dir, embeddings, index_name, mmap=mmap, spec=spec)]
+            parts.extend(load_part(index_dir / SEGMENTS_DIR, embeddings, name, mmap=mmap, spec=spec)
+                         for name in manifest["segments"])
+        return SegmentedVectorStore(parts, embeddings, version=manifest["version"], spec=spec)
+    except Exception as e:
+        log.error("Failed to load segmented index", index_dir=str(index_dir), error=str(e))
+        raise DocumentPortalException("Failed to load FAISS index", e) from e
+
+
+class SegmentedVectorStore(VectorStore):
+    """
+    Read view over a base FAISS index plus its delta segments.
+
+    Each part is searched for the top-k and the hits are merged by score, so
+    results match a single index holding all vectors. Writes go through
+    write_base()/append_segment(); add_part() keeps an in-memory view current.
+    """
+    def __init__(self, parts: List[FAISS], embeddings: Embeddings, version: int = 0,
+                 spec: Optional[Dict[str, Any]] = None):
+        if not parts:
+            raise ValueError("SegmentedVectorStore needs at least one part")
+        self.parts = list(parts)
+        self._embeddings = embeddings
+        self.version = version
+        self.spec = spec or {"type": "flat"}
+        for part in self.parts:
+            apply_search_params(part.index, self.spec)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embeddings
+
+    @property
+    def ntotal(self) -> int:
+        return sum(p.index.ntotal for p in self.parts)
+
+    def add_part(self, vs: FAISS, version: Optional[int] = None):
+        apply_search_params(vs.index, self.spec)
+        self.parts.append(vs)
+        if version is not None:
+            self.version = version
+
+    def _higher_is_better(self) -> bool:
+        return self.parts[0].distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+
+    def _merge(self, hits: Iterable[Tuple[Document, float]], k: int) -> List[Tuple[Document, float]]:
+        return sorted(hits, key=lambda h: h[1], reverse=self._higher_is_better())[:k]
+
+    # ---------- Similarity ----------
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Union[Callable, Dict[str, Any]]] = None,
+        fetch_k: int = 20, **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        parts = list(self.parts)
+        if len(parts) == 1:
+            return parts[0].similarity_search_with_score_by_vector(embedding, k, filter=filter, fetch_k=fetch_k, **kwargs)
+        hits: List[Tuple[Document, float]] = []
+        for part in parts:
+            hits.extend(part.similarity_search_with_score_by_vector(embedding, k, filter=filter, fetch_k=fetch_k, **kwargs))
+        return self._merge(hits, k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k, **kwargs)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = await self._embeddings.aembed_query(query)
+        return await run_blocking(self.similarity_search_with_score_by_vector, embedding, k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self.parts[0]._select_relevance_score_fn()
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any):
+        relevance = self._select_relevance_score_fn()
+        return [(d, relevance(s)) for d, s in self.similarity_search_with_score(query, k, **kwargs)]
+
+    # ---------- Positions ----------
+    # A position is a vector's index across all parts (base rows first, then each
+    # segment in manifest order). Compaction appends segments to the base in that
+    # order, so positions are stable and side indexes (BM25) can key on them.
+
+    def search_positions(self, embedding: List[float], k: int = 4) -> List[Tuple[int, float]]:
+        """Top-k (position, distance) across all parts, best first."""
+        query = np.array([embedding], dtype=np.float32)
+        hits: List[Tuple[int, float]] = []
+        offset = 0
+        for part in list(self.parts):
+            scores, rows = part.index.search(query, k)
+            hits.extend((offset + int(i), float(s)) for s, i in zip(scores[0], rows[0]) if i != -1)
+            offset += part.index.ntotal
+        return self._merge(hits, k)
+
+    def document_at(self, position: int) -> Document:
+        for part in list(self.parts):
+            if position < part.index.ntotal:
+                doc = part.docstore.search(part.index_to_docstore_id[position])
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Docstore has no document for position {position}")
+                return doc
+            position -= part.index.ntotal
+        raise IndexError("position out of range")
+
+    # ---------- MMR ----------
+
+    def max_marginal_relevance_search_by_vector(
+        self, embedding: List[float], k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5,
+        filter: Optional[Union[Callable, Dict[str, Any]]] = None, **kwargs: Any,
+    ) -> List[Document]:
+        parts = list(self.parts)
+        if len(parts) == 1:
+            return parts[0].max_marginal_relevance_search_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter)
+        query = np.array([embedding], dtype=np.float32)
+        # top fetch_k candidates across all parts, with their stored vectors for the diversity term
+        candidates: List[Tuple[Document, float, np.ndarray]] = []
+        for part in parts:
+            filter_func = part._create_filter_func(filter) if filter is not None else None
+            scores, indices = part.index.search(query, fetch_k if filter is None else fetch_k * 2)
+            for score, i in zip(scores[0], indices[0]):
+                if i == -1:
+                    continue
+                doc = part.docstore.search(part.index_to_docstore_id[i])
+                if not isinstance(doc, Document) or (filter_func and not filter_func(doc.metadata)):
+                    continue
+                candidates.append((doc, float(score), part.index.reconstruct(int(i))))
+        candidates.sort(key=lambda c: c[1], reverse=self._higher_is_better())
+        candidates = candidates[:fetch_k]
+        if not candidates:
+            return []
+        selected = maximal_marginal_relevance(query, [c[2] for c in candidates], k=k, lambda_mult=lambda_mult)
+        return [candidates[i][0] for i in selected]
+
+    def max_marginal_relevance_search(
+        self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embeddings.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs)
+
+    # ---------- Misc VectorStore API ----------
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        docs: List[Document] = []
+        for part in list(self.parts):
+            docs.extend(part.get_by_ids(ids))
+        return docs
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("SegmentedVectorStore is read-only; add documents through FaissManager")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "SegmentedVectorStore":
+        return cls([FAISS.from_texts(texts, embedding, metadatas=metadatas, **kwargs)], embedding)
+
+
+# ---------- Compaction ----------
+
+def compact(index_dir: Union[str, Path], embeddings: Embeddings, index_name: str = "index") -> int:
+    """
+    Fold the segments listed right now into the base index and return how many
+    were merged. The merge itself runs without the directory lock; only the final
+    swap of base files + manifest holds it, so appends continue meanwhile. Only
+    one process compacts a directory at a time; others return 0 straight away.
+    """
+    index_dir = Path(index_dir)
+    with _compaction_slot(index_dir) as acquired:
+        if not acquired:
+            log.info("Index compaction already running in another process", index_dir=str(index_dir))
+            return 0
+        return _compact(index_dir, embeddings, index_name)
+
+
+def _compact(index_dir: Path, embeddings: Embeddings, index_name: str) -> int:
+    seg_dir = index_dir / SEGMENTS_DIR
+    with dir_lock(index_dir):
+        snapshot = read_manifest(index_dir)
+    merged_names = snapshot["segments"]
+    if not merged_names:
+        return 0
+
+    # private, writable copies: merging mutates both sides' direct maps
+    parts = [load_part(index_dir, embeddings, index_name)]
+    parts.extend(load_part(seg_dir, embeddings, name) for name in merged_names)
+    merged = parts[0].index
+    for part in parts[1:]:
+        merge_into(merged, part.index)
+    merged, factory, template = _maybe_upgrade(merged, snapshot)
+    tmp_name = f"{index_name}.compact"
+    write_docstore(index_dir, tmp_name, (row for part in parts for row in faiss_rows(part)))
+    faiss.write_index(merged, str(index_dir / f"{tmp_name}.faiss"))
+
+    with dir_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        if manifest["segments"][:len(merged_names)] != merged_names:
+            # the base was rewritten underneath us (write_base); drop this merge
+            for p in part_files(index_dir, tmp_name):
+                p.unlink(missing_ok=True)
+            return 0
+        _install_part(index_dir, tmp_name, index_name)
+        if template is not None:
+            _write_template(index_dir, index_name, template)
+            manifest["index_factory"] = factory
+        manifest["segments"] = manifest["segments"][len(merged_names):]
+        manifest["version"] += 1
+        _write_manifest(index_dir, manifest)
+    for name in merged_names:
+        for p in part_files(seg_dir, name):
+            p.unlink(missing_ok=True)
+    log.info("Index segments compacted", index_dir=str(index_dir), segments=len(merged_names),
+             ntotal=merged.ntotal, version=manifest["version"])
+    return len(merged_names)
+
+
+def _maybe_upgrade(merged: Any, manifest: Dict[str, Any]) -> Tuple[Any, str, Any]:
+    """
+    Rebuild a base that started flat (first batch too small to train) as the
+    configured index type once it holds enough vectors. Returns (index, factory,
+    new template or None).
+    """
+    spec, factory = manifest["index_spec"], manifest["index_factory"]
+    if factory != FLAT_FACTORY or spec.get("type", "flat") == "flat":
+        return merged, factory, None
+    vectors = merged.reconstruct_n(0, merged.ntotal)
+    upgraded, new_factory = build_index(spec, vectors)
+    if new_factory == FLAT_FACTORY:
+        return merged, factory, None
+    template = faiss.clone_index(upgraded)
+    upgraded.add(vectors)
+    finalize_index(upgraded)
+    log.info("Index rebuilt as configured type", factory=new_factory, ntotal=upgraded.ntotal)
+    return upgraded, new_factory, template
+
+
+class SegmentCompactor:
+    """Single background worker that compacts index directories; repeat requests for a queued dir coalesce."""
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-compact")
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+
+    def schedule(self, index_dir: Union[str, Path], embeddings: Embeddings, index_name: str = "index") -> bool:
+        key = os.path.abspath(index_dir)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._run, key, embeddings, index_name)
+        return True
+
+    def _run(self, key: str, embeddings: Embeddings, index_name: str):
+        with self._lock:
+            self._pending.discard(key)
+        try:
+            compact(key, embeddings, index_name)
+        except Exception as e:
+            log.error("Index compaction failed", index_dir=key, error=str(e))
+
+
+_compactor: Optional[SegmentCompactor] = None
+_compactor_lock = threading.Lock()
+
+def get_segment_compactor() -> SegmentCompactor:
+    global _compactor
+    if _compactor is None:
+        with _compactor_lock:
+            if _compactor is None:
+                _compactor = SegmentCompactor()
+    return _compactor
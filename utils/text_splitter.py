@@ -0,0 +1,104 @@
+from __future__ import annotations
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Deque, Iterable, Iterator, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from utils.tokens import count_tokens
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+class PageTextSplitter:
+    """
+    Splits page Documents into chunks of at most chunk_tokens, measured with a
+    tokenizer-length function rather than characters, with up to overlap_tokens
+    of trailing context repeated at the start of the next chunk.
+
+    Text is cut on the coarsest separator it contains; each piece is measured
+    once and pieces are packed greedily from running totals, so only pieces
+    over budget are split again on the next separator (and cut evenly as a last
+    resort). Every chunk keeps a copy of its page's metadata (source, page...).
+    Stateless once built, so one instance is shared across threads.
+    """
+    def __init__(self, chunk_tokens: int = 250, overlap_tokens: int = 50,
+                 length_function: Callable[[str], int] = count_tokens,
+                 separators: Sequence[str] = DEFAULT_SEPARATORS):
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens must be positive")
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be at least 0 and smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.length = length_function
+        self.separators = tuple(separators)
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self._split(text, 0))
+
+    def iter_documents(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """Lazily chunk a stream of page Documents; chunks are yielded as each page is split."""
+        for doc in docs:
+            metadata = doc.metadata or {}
+            for chunk in self._split(doc.page_content, 0):
+                yield Document(page_content=chunk, metadata=dict(metadata))
+
+    def split_documents(self, docs: Iterable[Document]) -> List[Document]:
+        return list(self.iter_documents(docs))
+
+    def _split(self, text: str, level: int) -> Iterator[str]:
+        while level < len(self.separators) and self.separators[level] not in text:
+            level += 1
+        if level == len(self.separators):
+            yield from self._cut(text)
+            return
+        sep = self.separators[level]
+        sep_len = self.length(sep)
+        budget, overlap = self.chunk_tokens, self.overlap_tokens
+
+        window: Deque[Tuple[str, int]] = deque()
+        total = 0  # tokens in window, separators included
+        for piece in text.split(sep):
+            if not piece.strip():
+                continue
+            n = self.length(piece)
+            if n > budget:
+                if window:
+                    yield from self._joined(sep, window)
+                    window.clear()
+                    total = 0
+                yield from self._split(piece, level + 1)
+                continue
+            if window and total + sep_len + n > budget:
+                yield from self._joined(sep, window)
+                # keep the tail that fits in the overlap and leaves room for this piece
+                while window and (total > overlap or total + sep_len + n > budget):
+                    _, m = window.popleft()
+                    total -= m + (sep_len if window else 0)
+            total += n + (sep_len if window else 0)
+            window.append((piece, n))
+        if window:
+            yield from self._joined(sep, window)
+
+    @staticmethod
+    def _joined(sep: str, window: Deque[Tuple[str, int]]) -> Iterator[str]:
+        chunk = sep.join(p for p, _ in window).strip()
+        if chunk:
+            yield chunk
+
+    def _cut(self, text: str) -> List[str]:
+        """Even character slices of a run with no separators (e.g. a long URL or table row)."""
+        text = text.strip()
+        n = self.length(text)
+        if n <= self.chunk_tokens:
+            return [text] if text else []
+        parts = -(-n // self.chunk_tokens)
+        step = -(-len(text) // parts)
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+@lru_cache(maxsize=16)
+def get_text_splitter(chunk_tokens: int, overlap_tokens: int) -> PageTextSplitter:
+    """Shared splitter per (chunk_tokens, overlap_tokens), built on first use."""
+    return PageTextSplitter(chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
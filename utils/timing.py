@@ -0,0 +1,26 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StageTimer:
+    """Accumulates wall time (ms) per named stage of a pipeline."""
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed, 2)
+
+    def merge(self, timings: Dict[str, float]):
+        for name, ms in timings.items():
+            self.timings[name] = round(self.timings.get(name, 0.0) + ms, 2)
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(self.timings.values()), 2)
@@ -0,0 +1,60 @@
+import math
+from functools import lru_cache
+from typing import Callable, Optional
+
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+CHARS_PER_TOKEN = 4
+TIKTOKEN_ENCODING = "cl100k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), for sizing prompts and windows."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def chars_to_tokens(chars: int) -> int:
+    """A character budget (e.g. the API's chunk_size) expressed in tokens."""
+    return math.ceil(chars / CHARS_PER_TOKEN)
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """tiktoken encoding loaded once per process; None when tiktoken or its encoding is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+    except Exception:
+        return None
+
+
+def _word_tokens(text: str) -> int:
+    # fallback: each whitespace-delimited word costs one token per started 4 characters
+    return sum((len(word) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for word in text.split())
+
+
+def tokenizer_name() -> str:
+    return f"tiktoken:{TIKTOKEN_ENCODING}" if _encoder() is not None else "words"
+
+
+@lru_cache(maxsize=1)
+def _length_function() -> Callable[[str], int]:
+    enc: Optional[object] = _encoder()
+    if enc is None:
+        log.warning("tiktoken unavailable; counting tokens with the per-word estimate",
+                    encoding=TIKTOKEN_ENCODING)
+        return _word_tokens
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """
+    Token count with a BPE tokenizer (tiktoken cl100k_base) when available, else
+    a per-word approximation. Either is an approximation for Gemini models, whose
+    tokenizer is not cl100k_base. Memoized: page headers, footers and other repeated
+    lines are counted once.
+    """
+    return _length_function()(text)
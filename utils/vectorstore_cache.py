@@ -0,0 +1,178 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from logger.custom_logger import CustomLogger
+from utils.segmented_index import MANIFEST_NAME, part_files, segment_files
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def faiss_files_signature(index_dir: str, index_name: str = "index") -> Signature:
+    """
+    (name, mtime_ns, size) of the base index files, the segment manifest and every
+    listed delta segment; changes whenever a segment is appended or compacted.
+    """
+    sig = []
+    paths = part_files(index_dir, index_name)
+    paths.append(Path(index_dir) / MANIFEST_NAME)
+    paths.extend(segment_files(index_dir))
+    for p in paths:
+        try:
+            st = p.stat()
+            sig.append((p.name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((p.name, -1, -1))
+    return tuple(sig)
+
+
+@dataclass
+class _Entry:
+    value: Any
+    signature: Signature
+    nbytes: int
+    attachments: Dict[str, Any] = field(default_factory=dict)
+
+
+class VectorStoreCache:
+    """
+    Bounded LRU cache of loaded vectorstores keyed by index directory.
+
+    Entries are sized by the on-disk size of their index files (a close proxy
+    for the in-memory footprint) and evicted least-recently-used once the total
+    exceeds max_bytes. A cached entry is reloaded when its files change on disk,
+    e.g. after FaissManager.add_documents() rewrote the index. Objects derived
+    from an index (its BM25 connection) can be attached to the entry and live
+    exactly as long as it does.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(index_dir: str, index_name: str) -> Tuple[str, str]:
+        return (os.path.abspath(index_dir), index_name)
+
+    def get(
+        self,
+        index_dir: str,
+        loader: Callable[[], Any],
+        index_name: str = "index",
+        signature_fn: Callable[[str, str], Signature] = faiss_files_signature,
+    ) -> Any:
+        """Return the cached vectorstore for index_dir, calling loader() on miss or staleness."""
+        key = self._key(index_dir, index_name)
+        signature = signature_fn(index_dir, index_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # one loader per key; concurrent callers for the same index wait and reuse it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+                stale = entry is not None
+            value = loader()
+            nbytes = sum(size for _, _, size in signature if size > 0)
+            with self._lock:
+                self.misses += 1
+                if stale:
+                    self.reloads += 1
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._total_bytes -= old.nbytes
+                self._entries[key] = _Entry(value, signature, nbytes)
+                self._total_bytes += nbytes
+                self._evict()
+            log.info("Vectorstore loaded into cache", index_dir=key[0], index_name=index_name,
+                     bytes=nbytes, reloaded=stale)
+            return value
+
+    def attachment(self, index_dir: str, name: str, factory: Callable[[], Any], index_name: str = "index") -> Any:
+        """
+        Object built by factory() once per cached entry of index_dir and reused until
+        the entry is reloaded or evicted; built fresh each call if the index is not cached.
+        """
+        key = self._key(index_dir, index_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            value = entry.attachments.get(name) if entry is not None else None
+        if value is not None:
+            return value
+        value = factory()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value = entry.attachments.setdefault(name, value)
+        return value
+
+    def _evict(self):
+        # always keep the most recent entry, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.nbytes
+            self.evictions += 1
+            log.info("Vectorstore evicted from cache", index_dir=key[0], bytes=entry.nbytes)
+
+    def invalidate(self, index_dir: str, index_name: str = "index"):
+        with self._lock:
+            entry = self._entries.pop(self._key(index_dir, index_name), None)
+            if entry is not None:
+                self._total_bytes -= entry.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache: Optional[VectorStoreCache] = None
+_cache_lock = threading.Lock()
+
+def get_vectorstore_cache() -> VectorStoreCache:
+    """Process-wide cache sized from config.yaml `vectorstore_cache.max_bytes`."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from utils.model_loader import get_model_registry
+                cfg = get_model_registry().config.get("vectorstore_cache", {}) or {}
+                _cache = VectorStoreCache(max_bytes=int(cfg.get("max_bytes", DEFAULT_MAX_BYTES)))
+    return _cache